@@ -0,0 +1,73 @@
+"""
+Migration script to add the updated_at column to the qrcodes table.
+
+Offline scanners pull changes by updated_at, the server time of the last
+write, since an offline scan's scanned_at is the device's clock.
+Existing tickets are backfilled in batches with their scan or issue
+time, then the (event_id, updated_at) index is built.
+"""
+import sys
+import os
+
+# Add the app directory to the path
+app_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app')
+sys.path.insert(0, app_dir)
+
+from server.database import SessionLocal
+from sqlalchemy import text
+from add_query_indexes import add_query_indexes
+
+BATCH_SIZE = 10000
+
+def add_qrcode_updated_at_column():
+    """Add updated_at to qrcodes and backfill it for existing tickets"""
+    db = SessionLocal()
+    try:
+        check_query = text("""
+            SELECT column_name
+            FROM information_schema.columns
+            WHERE table_name='qrcodes' AND column_name='updated_at'
+        """)
+        if db.execute(check_query).fetchone():
+            print("Column 'updated_at' already exists. Backfilling any missing values...")
+        else:
+            print("Adding 'updated_at' column...")
+            db.execute(text("ALTER TABLE qrcodes ADD COLUMN updated_at TIMESTAMP"))
+            db.commit()
+            print("✅ Column added successfully!")
+
+        # Short batches keep row locks brief while gates are scanning
+        updated_count = 0
+        while True:
+            result = db.execute(text("""
+                UPDATE qrcodes
+                SET updated_at = COALESCE(scanned_at, created_at, now() AT TIME ZONE 'utc')
+                WHERE id IN (
+                    SELECT id FROM qrcodes WHERE updated_at IS NULL LIMIT :batch
+                )
+            """), {"batch": BATCH_SIZE})
+            db.commit()
+            updated_count += result.rowcount
+            if result.rowcount < BATCH_SIZE:
+                break
+            print(f"  {updated_count} tickets backfilled...")
+
+        print(f"✅ Backfilled updated_at on {updated_count} tickets.")
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error: {str(e)}")
+        raise
+    finally:
+        db.close()
+
+    add_query_indexes()
+    return updated_count
+
+if __name__ == "__main__":
+    print("Starting migration to add updated_at column to qrcodes...")
+    try:
+        count = add_qrcode_updated_at_column()
+        print(f"\n✅ Migration completed successfully! {count} tickets backfilled.")
+    except Exception as e:
+        print(f"\n❌ Migration failed: {str(e)}")
+        sys.exit(1)
@@ -0,0 +1,67 @@
+"""
+Migration script to build the secondary indexes declared on the models
+(foreign keys, listing and sales rollup columns) on an existing database.
+
+create_all only creates missing tables, so databases created before the
+indexes were declared need this. Indexes are built with CREATE INDEX
+CONCURRENTLY, which doesn't block bookings or check-ins while it runs,
+and the script can be re-run: existing indexes are skipped and ones left
+invalid by an interrupted build are rebuilt.
+"""
+import sys
+import os
+
+# Add the app directory to the path
+app_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app')
+sys.path.insert(0, app_dir)
+
+from server.database import engine
+from server.models.event_model import Event
+from server.models.participant_model import Participant
+from server.models.qrcode_model import QRCode
+from server.models.otp_records_model import OTPRecord
+from sqlalchemy import text
+from sqlalchemy.schema import CreateIndex
+
+MODELS = [Event, Participant, QRCode, OTPRecord]
+
+def add_query_indexes():
+    """Create every index of MODELS that is missing or invalid"""
+    created = 0
+    # CONCURRENTLY can't run inside a transaction block
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for model in MODELS:
+            for index in sorted(model.__table__.indexes, key=lambda i: i.name):
+                state = conn.execute(text("""
+                    SELECT i.indisvalid
+                    FROM pg_class c
+                    JOIN pg_index i ON i.indexrelid = c.oid
+                    WHERE c.relname = :name
+                """), {"name": index.name}).first()
+
+                if state and state.indisvalid:
+                    print(f"Index '{index.name}' already exists.")
+                    continue
+                if state:
+                    print(f"Index '{index.name}' is invalid (interrupted build), dropping it...")
+                    conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{index.name}"'))
+
+                ddl = str(CreateIndex(index).compile(dialect=engine.dialect))
+                ddl = ddl.replace("CREATE INDEX", "CREATE INDEX CONCURRENTLY", 1)
+                print(f"Building index '{index.name}'...")
+                conn.execute(text(ddl))
+                created += 1
+
+        print("Updating planner statistics...")
+        for model in MODELS:
+            conn.execute(text(f"ANALYZE {model.__tablename__}"))
+    return created
+
+if __name__ == "__main__":
+    print("Starting migration to add query indexes...")
+    try:
+        count = add_query_indexes()
+        print(f"\n✅ Migration completed successfully! {count} indexes built.")
+    except Exception as e:
+        print(f"\n❌ Migration failed: {str(e)}")
+        sys.exit(1)
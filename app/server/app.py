@@ -1,6 +1,7 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+import asyncio
 import os
 
 from server.routes.user_route import router as UserRouter
@@ -8,6 +9,14 @@ from server.routes.host_route import router as HostRouter
 from server.routes.event_route import router as EventRouter
 from server.routes.participant_route import router as ParticipantRouter
 from server.routes.qr_code_route import router as QRcodeRouter
+from server.controller.seat_hold_controller import run_seat_hold_sweeper
+from server.controller.job_queue import run_job_worker
+from server.controller.outbox import run_outbox_relay
+from server.controller.qr_renderer import qr_renderer
+from server.controller.mail_transport import mail_pool
+from server.controller.ws_broker import ws_broker
+from server.controller import qrcode_event_controller  # registers ticket job handlers
+from server.constant_file import job_worker_in_app
 
 from server.database import Base, engine
 from server.models.user_model import User
@@ -16,9 +25,33 @@ from server.models.qrcode_model import QRCode
 from server.models.event_model import Event
 from server.models.participant_model import Participant
 from server.models.host_model import Host
+from server.models.seat_hold_model import SeatHold
+from server.models.job_model import Job
+from server.models.outbox_model import OutboxEvent
+from server.models.sales_daily_model import SalesDaily
 
 app = FastAPI()
 
+
+@app.on_event("startup")
+async def start_background_tasks():
+    # Return expired checkout holds to their events
+    app.state.seat_hold_sweeper = asyncio.create_task(run_seat_hold_sweeper())
+    # Live updates from the other workers
+    await ws_broker.start()
+    # Committed change events -> WebSocket broadcasts (one worker relays at a time)
+    app.state.outbox_relay = asyncio.create_task(run_outbox_relay())
+    if job_worker_in_app:
+        # Ticket rendering and emails; can also run separately with `python worker.py`
+        app.state.job_worker = asyncio.create_task(run_job_worker())
+
+
+@app.on_event("shutdown")
+async def stop_background_work():
+    qr_renderer.shutdown()
+    mail_pool.close()
+    await ws_broker.stop()
+
 # Mount static files directory for serving uploaded images
 # The uploads directory is relative to the app directory
 base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -47,4 +80,6 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["POST", "GET", "OPTIONS", "DELETE", "PUT"],
     allow_headers=["*"],
+    # Browsers hide response headers from scripts unless listed here
+    expose_headers=["X-Next-Cursor"],
 )
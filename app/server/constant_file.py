@@ -1,8 +1,18 @@
+import os
+from dotenv import load_dotenv
+
+# .env may not have been loaded yet (database.py loads it too)
+load_dotenv()
 
 
 ## encryption and decryption secret key
 secret_key=61
 
+## ticket token signing key (HMAC-SHA256); required, anyone who knows it can issue tickets
+ticket_signing_key=os.getenv("TICKET_SIGNING_KEY")
+if not ticket_signing_key:
+    raise RuntimeError("TICKET_SIGNING_KEY is not set; set it (e.g. in .env) to a long random secret")
+
 
 password_reset_subject="OTP for Password Reset"
 Otp_verification_subject="OTP for Verification"
@@ -13,4 +23,65 @@ user_role_name='user'
 host_role_name='host'
 admin_role_name='admin'
 
+## key a websocket client must send to subscribe to the admin topic (unset: nobody can)
+admin_ws_key=os.getenv("ADMIN_WS_KEY")
+ws_send_queue_size=64                 # messages buffered per client
+ws_slow_consumer_policy="drop_oldest" # when a client's buffer is full: drop_oldest or disconnect
+ws_send_timeout=5                     # seconds one send may take before the client is dropped
+ws_broker_backend=os.getenv("WS_BROKER", "postgres")   # postgres (LISTEN/NOTIFY, every worker) or memory (this process)
+ws_notify_channel="ws_broadcast"
+ws_broker_reconnect_delay=2           # seconds between listener reconnect attempts
+
 not_possible_to_change_email="Invalid to change email"
+
+## event listings
+event_page_size=50
+event_page_size_max=200
+
+## flash sale (high demand) booking
+flash_sale_batch_size=200
+flash_sale_flush_interval=0.02   # seconds between batch flushes
+
+## seat holds (checkout)
+seat_hold_ttl_minutes=10
+seat_hold_sweep_interval=30   # seconds between expired hold sweeps
+
+## background job queue
+job_batch_size=20
+job_poll_interval=1.0         # seconds to wait when the queue is empty
+job_max_attempts=5
+job_retry_base_delay=10       # seconds, doubled on every failed attempt
+job_visibility_timeout=300    # seconds before a running job of a dead worker is retried
+job_dead_retention_days=14    # dead jobs are kept this long for inspection
+job_purge_interval=3600       # seconds between retention sweeps
+job_worker_in_app=True        # also run a worker inside the API process
+
+## live seat counters (server-sent events)
+seat_stream_max_rate=2        # updates per second per event, at most
+seat_stream_heartbeat=15      # seconds between keep-alive comments
+
+## change event outbox
+outbox_batch_size=100
+outbox_poll_interval=0.1      # seconds to wait when the outbox is empty
+
+## tickets
+qr_render_cache_size=2048      # rendered QR images kept in memory
+qr_matrix_cache_size=4096      # QR module matrices kept per process
+qr_render_workers=int(os.getenv("QR_RENDER_WORKERS", os.cpu_count() or 1))   # 0 renders batches in a thread
+qr_render_chunk_size=64        # tickets per process pool task
+qr_error_correction="M"        # L, M, Q or H
+qr_mask_pattern=None           # None picks the best of the 8 masks; a fixed 0-7 renders ~6x faster
+qr_box_size=10                 # pixels per module
+qr_border=4                    # modules of quiet zone
+qr_format="png"                # png or svg
+
+## offline scanner manifest
+checkin_sync_overlap=5        # seconds re-read on every ?since= pull
+ticket_email_batched=True     # one email with every ticket of a booking instead of one per ticket
+
+## outgoing mail (SMTP_* environment variables override, e.g. for a local test server)
+smtp_host=os.getenv("SMTP_HOST", "smtp.gmail.com")
+smtp_port=int(os.getenv("SMTP_PORT", 587))
+smtp_use_tls=os.getenv("SMTP_USE_TLS", "true").lower() in ("1", "true", "yes")
+smtp_pool_size=int(os.getenv("SMTP_POOL_SIZE", 4))
+smtp_idle_check=30            # seconds idle before a pooled connection is NOOP-checked
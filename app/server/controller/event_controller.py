@@ -1,29 +1,32 @@
-from sqlalchemy import or_
-from sqlalchemy.orm import Session
+from sqlalchemy import or_, select, func, tuple_, true
+from sqlalchemy.ext.asyncio import AsyncSession
 from server.models.event_model import * 
 from server.models.host_model import Host
-from server.controller.ws_manager import event_manager
-from datetime import datetime, timedelta
+from server.models.participant_model import Participant
+from server.models.sales_daily_model import SalesDaily
+from server.controller.ws_manager import event_manager, event_topic, host_topic, ADMIN_TOPIC
+from server.controller.outbox import add_outbox_event, outbox_handler
+from server.controller.sales_rollup import move_daily_sales_category
+from server.controller.time_series import time_series
+from server.controller.participent_controller import get_monthly_event_sale
+from datetime import datetime, timedelta, time, timezone
 from server.response_model import ResponseModel, ErrorResponseModel
 import asyncio
+import base64
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
-import smtplib
-from server.constant_file import eventisa_email, eventisa_email_password
+from server.controller.mail_transport import send_mail
+from server.constant_file import eventisa_email, event_page_size, event_page_size_max
 
 # ------------------ Add New User ------------------
-async def add_event_controller(db:Session,event_data:dict):
+async def add_event_controller(db:AsyncSession,event_data:dict):
     # Set approval_status to pending by default if not provided
     if "approval_status" not in event_data:
         event_data["approval_status"] = "pending"
     new_event=Event(**event_data)
     db.add(new_event)
-    db.commit()
-    db.refresh(new_event)
-
-    await event_manager.broadcast({
-    "event": "new_event",
-    "data": {
+    await db.flush()
+    add_outbox_event(db, "event_added", {
         "id": new_event.id,
         "host_id": new_event.host_id,
         "event_title": new_event.event_title,
@@ -36,34 +39,95 @@ async def add_event_controller(db:Session,event_data:dict):
         "total_seat": new_event.total_seat,
         "filled_seat": new_event.filled_seat,
         "event_category": new_event.event_category,
-        }
     })
+    await db.commit()
+    await db.refresh(new_event)
 
     return new_event.__dict__
 
-# ------------------ Retrieve ALL Event ------------------
-async def retrieve_events_controller(db:Session, approval_status: str = "approved"):
-    from sqlalchemy.orm import joinedload
-    query = db.query(Event).options(joinedload(Event.participants))
+@outbox_handler("event_added")
+async def announce_event(payload: dict):
+    await event_manager.broadcast(
+        {"event": "new_event", "data": payload},
+        topics=[event_topic(payload["id"]), host_topic(payload["host_id"]), ADMIN_TOPIC]
+    )
+
+# ------------------ Retrieve a page of Events ------------------
+def _encode_event_cursor(event: Event) -> str:
+    raw = f"{event.event_date.isoformat()}|{event.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_event_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        event_date, event_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(event_date), int(event_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+
+
+async def retrieve_events_page(db: AsyncSession, approval_status: str = "approved", period: str = None,
+                               category: str = None, date_from: datetime = None, date_to: datetime = None,
+                               cursor: str = None, limit: int = event_page_size):
+    """
+    One page of events in (event_date, id) order, newest first for the
+    archive, and the cursor of the next page (None on the last one).
+    Pages continue after the cursor's row instead of using OFFSET, so
+    every page costs the same. `period` is "upcoming" or "archive".
+    """
+    limit = max(1, min(limit, event_page_size_max))
+    descending = period == "archive"
+
+    query = select(Event)
     if approval_status:
-        query = query.filter(Event.approval_status == approval_status)
-    return query.all()
+        query = query.where(Event.approval_status == approval_status)
+    today = datetime.combine(datetime.now().date(), time.min)
+    if period == "upcoming":
+        query = query.where(Event.event_date >= today)
+    elif period == "archive":
+        query = query.where(Event.event_date < today)
+    if category:
+        query = query.where(Event.event_category == category)
+    # event_date is stored without a time zone
+    if date_from:
+        if date_from.tzinfo:
+            date_from = date_from.astimezone(timezone.utc).replace(tzinfo=None)
+        query = query.where(Event.event_date >= date_from)
+    if date_to:
+        if date_to.tzinfo:
+            date_to = date_to.astimezone(timezone.utc).replace(tzinfo=None)
+        query = query.where(Event.event_date <= date_to)
+
+    key = tuple_(Event.event_date, Event.id)
+    if cursor:
+        after = tuple_(*_decode_event_cursor(cursor))
+        query = query.where(key < after if descending else key > after)
+    if descending:
+        query = query.order_by(Event.event_date.desc(), Event.id.desc())
+    else:
+        query = query.order_by(Event.event_date, Event.id)
+
+    events = (await db.scalars(query.limit(limit + 1))).all()
+    next_cursor = _encode_event_cursor(events[limit - 1]) if len(events) > limit else None
+    return events[:limit], next_cursor
 
 # ------------------ Retrieve Pending Events ------------------
-async def retrieve_pending_events_controller(db:Session):
+async def retrieve_pending_events_controller(db:AsyncSession):
     from sqlalchemy.orm import joinedload
     from server.models.host_model import Host
-    return db.query(Event).options(
+    query = select(Event).options(
         joinedload(Event.participants),
         joinedload(Event.host)
-    ).filter(Event.approval_status == "pending").all()
+    ).where(Event.approval_status == "pending")
+    return (await db.scalars(query)).unique().all()
 
 # ------------------ Send Approval Email to Host ------------------
 async def send_approval_email_to_host(host_email: str, host_name: str, event_title: str):
     """
     Send approval email to host when their event is approved
     """
-    def send_blocking_email():
+    def build_email():
         try:
             message = MIMEMultipart()
             message['From'] = eventisa_email
@@ -88,37 +152,32 @@ Founder & CEO
 Eventisa"""
             
             message.attach(MIMEText(email_body, 'plain'))
-            
-            # Send email
-            server = smtplib.SMTP('smtp.gmail.com', 587)
-            server.starttls()
-            server.login(eventisa_email, eventisa_email_password)
-            text = message.as_string()
-            server.sendmail(eventisa_email, host_email, text)
-            server.quit()
-            return True
+            return message
             
         except Exception as e:
-            print(f"SMTP Error sending approval email: {e}")
-            return False
+            print(f"Error building approval email: {e}")
+            return None
     
+    message = build_email()
+    if message is None:
+        return False
     try:
-        return await asyncio.to_thread(send_blocking_email)
+        return await send_mail(message, host_email)
     except Exception as e:
-        print(f"Error sending approval email: {e}")
+        print(f"SMTP Error sending approval email: {e}")
         return False
 
 # ------------------ Approve Event ------------------
-async def approve_event_controller(db:Session, event_id:int):
-    event = db.query(Event).filter(Event.id == event_id).first()
+async def approve_event_controller(db:AsyncSession, event_id:int):
+    event = await db.scalar(select(Event).where(Event.id == event_id))
     if not event:
         return None
     event.approval_status = "approved"
-    db.commit()
-    db.refresh(event)
+    await db.commit()
+    await db.refresh(event)
     
     # Send approval email to host
-    host = db.query(Host).filter(Host.id == event.host_id).first()
+    host = await db.scalar(select(Host).where(Host.id == event.host_id))
     if host and host.email:
         # Send email asynchronously (don't wait for it)
         asyncio.create_task(send_approval_email_to_host(
@@ -130,29 +189,29 @@ async def approve_event_controller(db:Session, event_id:int):
     return event.__dict__
 
 # ------------------ Reject Event ------------------
-async def reject_event_controller(db:Session, event_id:int):
-    event = db.query(Event).filter(Event.id == event_id).first()
+async def reject_event_controller(db:AsyncSession, event_id:int):
+    event = await db.scalar(select(Event).where(Event.id == event_id))
     if not event:
         return None
     event.approval_status = "rejected"
-    db.commit()
-    db.refresh(event)
+    await db.commit()
+    await db.refresh(event)
     return event.__dict__
 
 
 # ------------------ Retrieve Event by name/location/date/id/host id ------------------
-async def retrieve_event_controller(db:Session,field:str,value:str):
+async def retrieve_event_controller(db:AsyncSession,field:str,value:str):
     try:
         if field=="id":
-            return (db.query(Event).filter(Event.id==value).first())
+            return await db.scalar(select(Event).where(Event.id==value))
         elif field=="event_title":
-            return db.query(Event).filter(Event.event_title==value).first()
+            return await db.scalar(select(Event).where(Event.event_title==value))
         elif field=="event_location":
-            return db.query(Event).filter(Event.event_location==value).first()
+            return await db.scalar(select(Event).where(Event.event_location==value))
         elif field=="event_date":
-            return db.query(Event).filter(Event.event_date==value).first()
+            return await db.scalar(select(Event).where(Event.event_date==value))
         elif field=="host_id":
-            return db.query(Event).filter(Event.host_id==value).first()
+            return await db.scalar(select(Event).where(Event.host_id==value))
         
     except ValueError as v:
         return None
@@ -163,10 +222,10 @@ async def retrieve_event_controller(db:Session,field:str,value:str):
     
 
 # ------------------ Retrieve Multiple Event by name/location/date/id/host id ------------------
-async def retrieve_multiple_event_controller(db: Session, keyword: str):
+async def retrieve_multiple_event_controller(db: AsyncSession, keyword: str):
 
     search_pattern = f"%{keyword}%"
-    query = db.query(Event).filter(
+    query = select(Event).where(
         or_(
             # Match keyword against event_title
             Event.event_title.ilike(search_pattern),
@@ -182,49 +241,36 @@ async def retrieve_multiple_event_controller(db: Session, keyword: str):
     )
     
     # 3. Execute the query and return results
-    return query.all()
+    return (await db.scalars(query)).all()
 
 # ------------------ Update Event ------------------
-async def update_event_controller(db:Session,event_id:int,update_data:dict):
-    event=db.query(Event).filter(Event.id==event_id).first()
+async def update_event_controller(db:AsyncSession,event_id:int,update_data:dict):
+    event=await db.scalar(select(Event).where(Event.id==event_id))
     if not event:
         return None
     # print("got it 2")
     for key,val in update_data.items():
         setattr(event,key,val)
-
-    db.commit()
-    db.refresh(event)
-    return event.__dict__
-
-
-
-# ------------------ Update Event seat infor ------------------
-async def update_event_seat_controller(db: Session, event_id: int, update_data: dict):
-    
-    event = db.query(Event).filter(Event.id == event_id).first()
-    if not event:
-        return None
-
-    # Increment filled_seat if 'booked' key exists
-    booked_increment = update_data.get("booked")
-    if booked_increment:
-        event.filled_seat = int(event.filled_seat) + int(booked_increment)
-
-    db.commit()
-    db.refresh(event)
+    if "event_category" in update_data:
+        await move_daily_sales_category(db, event_id, update_data["event_category"])
+    if {"total_seat", "filled_seat"} & update_data.keys():
+        # Live seat counters (seat_stream) refresh from this
+        add_outbox_event(db, "seats_changed", {"event_id": event_id})
+
+    await db.commit()
+    await db.refresh(event)
     return event.__dict__
 
 
 
 # ------------------ Delete Event ------------------
-async def delete_event_controller(db:Session,id:int):
-    event=db.query(Event).filter(Event.id==id).first()
+async def delete_event_controller(db:AsyncSession,id:int):
+    event=await db.scalar(select(Event).where(Event.id==id))
     if not event:
         return None
     
-    db.delete(event)
-    db.commit()
+    await db.delete(event)
+    await db.commit()
 
     return event.__dict__
 
@@ -234,9 +280,9 @@ async def delete_event_controller(db:Session,id:int):
 
 # ------------------ Analysis Part ------------------
 # ------------------ Retrieve Event by name/location/date/id/host id ------------------
-async def retrieve_event_seat_availability(db:Session,event_id:int):
+async def retrieve_event_seat_availability(db:AsyncSession,event_id:int):
 
-    event_detail=db.query(Event).filter(Event.id==event_id).first()
+    event_detail=await db.scalar(select(Event).where(Event.id==event_id))
     if event_detail:
         event_seats = {
             "total_seat": event_detail.total_seat,
@@ -246,9 +292,9 @@ async def retrieve_event_seat_availability(db:Session,event_id:int):
     return []
 
 # ------------------ get target earning ------------------
-async def get_targeted_earning(db:Session,event_id:int):
+async def get_targeted_earning(db:AsyncSession,event_id:int):
 
-    event_detail=db.query(Event).filter(Event.id==event_id).first()
+    event_detail=await db.scalar(select(Event).where(Event.id==event_id))
     if event_detail:
 
         ticket_price=int(event_detail.event_price)
@@ -265,9 +311,9 @@ async def get_targeted_earning(db:Session,event_id:int):
 
 
 # ------------------ get target earning ------------------
-async def get_total_sale_info(db:Session,event_id:int):
+async def get_total_sale_info(db:AsyncSession,event_id:int):
 
-    event_detail=db.query(Event).filter(Event.id==event_id).first()
+    event_detail=await db.scalar(select(Event).where(Event.id==event_id))
     if event_detail:
 
         ticket_price=int(event_detail.event_price)
@@ -279,3 +325,67 @@ async def get_total_sale_info(db:Session,event_id:int):
         return event_sale
     return []
 
+
+# ------------------ Event dashboard (every analysis in one call) ------------------
+DASHBOARD_SECTIONS = ("seats", "target_earning", "total_sale", "event_sale",
+                      "daily_sales", "daily_participants", "monthly_sales")
+
+
+async def get_event_dashboard(db: AsyncSession, event_id: int, sections: list = None):
+    """
+    The host dashboard of an event: each section holds what its own
+    analysis endpoint returns. The event row and its booking totals come
+    from one query, both daily series from one gap-filled series over
+    sales_daily and the monthly one from a grouped read of it; each is
+    skipped when none of its sections is asked for. Returns None if the
+    event doesn't exist.
+    """
+    sections = list(sections or DASHBOARD_SECTIONS)
+    unknown = [s for s in sections if s not in DASHBOARD_SECTIONS]
+    if unknown:
+        raise ValueError(f"Unknown dashboard sections: {', '.join(unknown)}")
+
+    query = select(Event.total_seat, Event.filled_seat, Event.event_price).where(Event.id == event_id)
+    if "event_sale" in sections:
+        bookings = (
+            select(
+                func.sum(Participant.payment).label("total_sale"),
+                func.sum(Participant.total_booked).label("total_participants")
+            )
+            .where(Participant.event_id == event_id)
+            .subquery()
+        )
+        query = query.add_columns(bookings.c.total_sale, bookings.c.total_participants).join(bookings, true())
+    event = (await db.execute(query)).first()
+    if not event:
+        return None
+
+    ticket_price = int(event.event_price or 0)
+    dashboard = {}
+    if "seats" in sections:
+        dashboard["seats"] = {"total_seat": event.total_seat, "filled_seat": event.filled_seat}
+    if "target_earning" in sections:
+        total_seat = int(event.total_seat or 0)
+        dashboard["target_earning"] = {"target": "No target"} if total_seat < 0 else {"target": ticket_price * total_seat}
+    if "total_sale" in sections:
+        dashboard["total_sale"] = {"sale": ticket_price * int(event.filled_seat or 0)}
+    if "event_sale" in sections:
+        dashboard["event_sale"] = {
+            "total_sale": float(event.total_sale or 0.0),
+            "total_participants": event.total_participants or 0,
+        }
+
+    if {"daily_sales", "daily_participants"} & set(sections):
+        days = await time_series(
+            db, SalesDaily.day,
+            {"total_payment": func.sum(SalesDaily.revenue), "total_participants": func.sum(SalesDaily.tickets)},
+            SalesDaily.event_id == event_id
+        )
+        if "daily_sales" in sections:
+            dashboard["daily_sales"] = [{"date": d["date"], "total_payment": d["total_payment"]} for d in days]
+        if "daily_participants" in sections:
+            dashboard["daily_participants"] = [{"date": d["date"], "total_participants": d["total_participants"]} for d in days]
+    if "monthly_sales" in sections:
+        dashboard["monthly_sales"] = await get_monthly_event_sale(db, event_id)
+    return dashboard
+
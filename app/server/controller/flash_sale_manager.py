@@ -0,0 +1,169 @@
+import asyncio
+from typing import Any, Dict, List, Tuple
+from sqlalchemy import func, select, update, insert
+from server.database import new_session
+from server.controller.qrcode_event_controller import insert_tickets
+from server.controller.outbox import add_booking_events
+from server.controller.sales_rollup import add_daily_sales
+from server.models.event_model import Event
+from server.models.participant_model import Participant
+from server.constant_file import flash_sale_batch_size, flash_sale_flush_interval
+
+
+class FlashSale:
+    def __init__(self, event_id: int, remaining: int):
+        self.event_id = event_id
+        self.remaining = remaining
+        self.active = True
+        self.pending: List[Tuple[Dict[str, Any], asyncio.Future]] = []
+        self.flusher = None
+
+
+class FlashSaleManager:
+    """
+    Opt-in "high demand" mode for single events.
+
+    Seats are handed out from an in-process counter, so admission never
+    touches the events row. Each admitted booking holds its seats until the
+    flusher writes the whole batch with one conditional UPDATE and one bulk
+    INSERT, which turns N row-lock round trips into one per batch. The
+    conditional UPDATE keeps Postgres authoritative when several workers
+    run their own counters for the same event.
+    """
+
+    def __init__(self, batch_size: int = flash_sale_batch_size, flush_interval: float = flash_sale_flush_interval):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.sales: Dict[int, FlashSale] = {}
+
+    def is_active(self, event_id: int) -> bool:
+        sale = self.sales.get(event_id)
+        return bool(sale and sale.active)
+
+    async def enable(self, db, event_id: int):
+        event = await db.scalar(select(Event).where(Event.id == event_id))
+        if not event:
+            return None
+        remaining = int(event.total_seat) - int(event.filled_seat or 0)
+        sale = self.sales.get(event_id)
+        if sale:
+            sale.active = True
+            sale.remaining = remaining - sum(int(p["total_booked"]) for p, _ in sale.pending)
+        else:
+            sale = self.sales[event_id] = FlashSale(event_id, remaining)
+        return {"event_id": event_id, "high_demand": True, "remaining_seat": sale.remaining}
+
+    def disable(self, event_id: int):
+        sale = self.sales.get(event_id)
+        if not sale:
+            return None
+        # Bookings already admitted are still flushed; new ones go through the normal path
+        sale.active = False
+        if not sale.pending:
+            self.sales.pop(event_id, None)
+        return {"event_id": event_id, "high_demand": False}
+
+    async def book(self, participant_data: Dict[str, Any]):
+        """Hold seats from the counter and wait for the batch that persists them."""
+        sale = self.sales[participant_data["event_id"]]
+        seats = int(participant_data.get("total_booked") or 1)
+        if seats < 1:
+            raise ValueError("At least one seat must be booked")
+        if sale.remaining < seats:
+            return None
+
+        sale.remaining -= seats
+        future = asyncio.get_running_loop().create_future()
+        sale.pending.append((dict(participant_data, total_booked=seats), future))
+        if sale.flusher is None or sale.flusher.done():
+            sale.flusher = asyncio.create_task(self._run_flusher(sale))
+        return await future
+
+    async def _run_flusher(self, sale: FlashSale):
+        while sale.pending:
+            await asyncio.sleep(self.flush_interval)
+            batch = sale.pending[:self.batch_size]
+            del sale.pending[:self.batch_size]
+            await self._flush(sale, batch)
+        if not sale.active:
+            self.sales.pop(sale.event_id, None)
+
+    async def _flush(self, sale: FlashSale, batch):
+        total = sum(p["total_booked"] for p, _ in batch)
+        filled = func.coalesce(Event.filled_seat, 0)
+        db = new_session()
+        try:
+            price = await db.scalar(
+                update(Event)
+                .where(Event.id == sale.event_id, filled + total <= Event.total_seat)
+                .values(filled_seat=filled + total)
+                .returning(Event.event_price)
+            )
+            if price is None:
+                # Another worker sold seats this counter didn't know about
+                await db.rollback()
+                await self._flush_one_by_one(db, batch)
+                await self._resync(db, sale)
+                return
+
+            rows = [
+                {
+                    "host_id": p["host_id"],
+                    "event_id": sale.event_id,
+                    "user_id": p["user_id"],
+                    "total_booked": p["total_booked"],
+                    "payment": price * p["total_booked"],
+                    "due": p.get("due") or 0.0,
+                    "payment_date": p.get("payment_date"),
+                    "payment_time": p.get("payment_time"),
+                }
+                for p, _ in batch
+            ]
+            participants = (
+                await db.scalars(
+                    insert(Participant).returning(Participant, sort_by_parameter_order=True),
+                    rows
+                )
+            ).all()
+            # Tickets and the sales rollup of the whole batch, same transaction
+            await insert_tickets(db, participants)
+            await add_daily_sales(db, participants)
+            add_booking_events(db, participants)
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            sale.remaining += total
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            await db.close()
+
+        for (_, future), participant in zip(batch, participants):
+            if not future.done():
+                future.set_result(participant)
+
+    async def _resync(self, db, sale: FlashSale):
+        event = await db.scalar(
+            select(Event).where(Event.id == sale.event_id).execution_options(populate_existing=True)
+        )
+        held = sum(p["total_booked"] for p, _ in sale.pending)
+        sale.remaining = max(int(event.total_seat) - int(event.filled_seat or 0) - held, 0)
+
+    async def _flush_one_by_one(self, db, batch):
+        from server.controller.participent_controller import reserve_seats_and_add_participant
+
+        for payload, future in batch:
+            try:
+                participant = await reserve_seats_and_add_participant(db, payload)
+            except Exception as e:
+                await db.rollback()
+                if not future.done():
+                    future.set_exception(e)
+                continue
+            if not future.done():
+                future.set_result(participant)
+
+
+flash_sale_manager = FlashSaleManager()
@@ -1,30 +1,31 @@
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 import smtplib
-from sqlalchemy.orm import Session
+from sqlalchemy import select, func, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from server.models.host_model import * 
-from server.controller.ws_manager import host_manager
+from server.controller.ws_manager import host_manager, host_topic, ADMIN_TOPIC
+from server.controller.outbox import add_outbox_event, outbox_handler
 from server.cryptography import *
 from server.constant_file import (eventisa_email,
                                   password_reset_subject,
                                   eventisa_email_password)
 from server.models.otp_records_model import *
+from server.models.event_model import Event
+from server.models.participant_model import Participant
+from server.models.qrcode_model import QRCode
 from datetime import datetime, timedelta
 from server.response_model import ResponseModel, ErrorResponseModel
 from server.controller.otp_handler import *
 
 
 # ------------------ Add Host ------------------
-async def add_host(db:Session,host_data:dict):
+async def add_host(db:AsyncSession,host_data:dict):
     new_host= Host(**host_data)
     new_host.password=encrypt_password(new_host.password)
     db.add(new_host)
-    db.commit()
-    db.refresh(new_host)
-
-    await host_manager.broadcast({
-        "event":"new_host",
-        "data":{
+    await db.flush()
+    add_outbox_event(db, "host_added", {
         "id": new_host.id,
         "name": new_host.name,
         "email": new_host.email,
@@ -34,28 +35,36 @@ async def add_host(db:Session,host_data:dict):
         "upzilla_thana": new_host.upzilla_thana,
         "address": new_host.address,
         "image_url": new_host.image_url,
-        }
     })
+    await db.commit()
+    await db.refresh(new_host)
 
     await send_otp(db,new_host.email,"verification","host")
 
     return new_host.__dict__
 
+@outbox_handler("host_added")
+async def announce_host(payload: dict):
+    await host_manager.broadcast(
+        {"event": "new_host", "data": payload},
+        topics=[host_topic(payload["id"]), ADMIN_TOPIC]
+    )
+
 #------------------- host verification --------------------------
 
-async def resedning_otp_for_verification(db:Session,email:str,owner_type="host"):
-    owner = db.query(Host).filter(Host.email == email).first()
+async def resedning_otp_for_verification(db:AsyncSession,email:str,owner_type="host"):
+    owner = await db.scalar(select(Host).where(Host.email == email))
     if not owner:
         return ErrorResponseModel("Owner not found", 404, f"No {owner_type} with this email.")
 
-    otp_record = db.query(OTPRecord).filter(
+    otp_record = await db.scalar(select(OTPRecord).where(
         OTPRecord.owner_id == owner.id,
         OTPRecord.owner_type == owner_type
-    ).first()
+    ))
 
     if otp_record and otp_record.expires_at < datetime.utcnow():
-        db.delete(otp_record)
-        db.commit()
+        await db.delete(otp_record)
+        await db.commit()
         return ErrorResponseModel("Expired OTP", 400, "OTP has expired.")
     
     await send_otp(db,email,"verification","host")
@@ -63,15 +72,15 @@ async def resedning_otp_for_verification(db:Session,email:str,owner_type="host")
 
 #------------------- host verification --------------------------
 
-async def verification_of_host(db:Session,email:str,otp:str,owner_type="host"):
-    owner = db.query(Host).filter(Host.email == email).first()
+async def verification_of_host(db:AsyncSession,email:str,otp:str,owner_type="host"):
+    owner = await db.scalar(select(Host).where(Host.email == email))
     if not owner:
         return ErrorResponseModel("Owner not found", 404, f"No {owner_type} with this email.")
 
-    otp_record = db.query(OTPRecord).filter(
+    otp_record = await db.scalar(select(OTPRecord).where(
         OTPRecord.owner_id == owner.id,
         OTPRecord.owner_type == owner_type
-    ).first()
+    ))
 
     if not otp_record:
         return ErrorResponseModel("OTP not found", 404, "No OTP record found.")
@@ -80,26 +89,26 @@ async def verification_of_host(db:Session,email:str,otp:str,owner_type="host"):
         return ErrorResponseModel("Invalid OTP", 400, "Incorrect OTP.")
 
     if otp_record.expires_at < datetime.utcnow():
-        db.delete(otp_record)
-        db.commit()
+        await db.delete(otp_record)
+        await db.commit()
         return ErrorResponseModel("Expired OTP", 400, "OTP has expired.")
 
     # OTP is valid — delete it and allow password reset
-    db.delete(otp_record)
-    db.commit()
+    await db.delete(otp_record)
+    await db.commit()
 
-    owner = db.query(Host).filter(Host.email == email).first()
+    owner = await db.scalar(select(Host).where(Host.email == email))
     setattr(owner,"verification","verified")
-    db.commit()
-    db.refresh(owner)
+    await db.commit()
+    await db.refresh(owner)
     
     return ResponseModel({"email": owner.email}, "Host Verified")
 
 
 
 # -------------------- Login host -----------------
-async def host_login(db:Session,email:str,password:str):
-    host=db.query(Host).filter(Host.email==email).first()
+async def host_login(db:AsyncSession,email:str,password:str):
+    host=await db.scalar(select(Host).where(Host.email==email))
     if not host:
         return {"status":"failed","msg":"Email not found"}
     if (host.verification=="unverified"):
@@ -112,31 +121,31 @@ async def host_login(db:Session,email:str,password:str):
 
 
 # ------------------ Retrieve Hosts ------------------
-async def retrieve_hosts(db:Session):
-    return db.query(Host).all()
+async def retrieve_hosts(db:AsyncSession):
+    return (await db.scalars(select(Host))).all()
 
 # ------------------ Retrieve Host ------------------
-async def retrieve_host(db:Session,field:str,value:str):
+async def retrieve_host(db:AsyncSession,field:str,value:str):
     if field=="id":
-        return db.query(Host).filter(Host.id==value).first()
+        return await db.scalar(select(Host).where(Host.id==value))
     elif field=="email":
-        return db.query(Host).filter(Host.email==value).first()
+        return await db.scalar(select(Host).where(Host.email==value))
     elif field=="name":
-        return db.query(Host).filter(Host.name==value).first()
+        return await db.scalar(select(Host).where(Host.name==value))
     elif field=="phone_number":
-        return db.query(Host).filter(Host.phone_number==value).first()
+        return await db.scalar(select(Host).where(Host.phone_number==value))
     
 
 # ------------------ Retrieve Hosts ------------------
-async def retrieve_user(db:Session,field:str,value:str):
+async def retrieve_user(db:AsyncSession,field:str,value:str):
     if field=="name":
-        return db.query(Host).filter(Host.name==value).all()
+        return (await db.scalars(select(Host).where(Host.name==value))).all()
     if field=="phone_number":
-        return db.query(Host).filter(Host.phone_number==value).all()
+        return (await db.scalars(select(Host).where(Host.phone_number==value))).all()
     
 # ------------------ Update Host ------------------
-async def update_host(db:Session,host_id:int,update_data:dict):
-    host=db.query(Host).filter(Host.id==host_id).first()
+async def update_host(db:AsyncSession,host_id:int,update_data:dict):
+    host=await db.scalar(select(Host).where(Host.id==host_id))
     if not host:
         return None
     # print("got it 1")
@@ -146,35 +155,35 @@ async def update_host(db:Session,host_id:int,update_data:dict):
     for key,val in update_data.items():
         setattr(host,key,val)
 
-    db.commit()
-    db.refresh(host)
+    await db.commit()
+    await db.refresh(host)
     return host.__dict__
 
 
 # ------------------ Delete Host ------------------
-async def delete_host(db:Session,email:str):
-    host=db.query(Host).filter(Host.email==email).first()
+async def delete_host(db:AsyncSession,email:str):
+    host=await db.scalar(select(Host).where(Host.email==email))
     if not host:
         return None
     
-    db.delete(host)
-    db.commit()
+    await db.delete(host)
+    await db.commit()
 
     return host.__dict__
 
 
-async def send_otp(db:Session,email:str,message:str,owner_type:str="host"):
-    owner = db.query(Host).filter(Host.email == email).first()
+async def send_otp(db:AsyncSession,email:str,message:str,owner_type:str="host"):
+    owner = await db.scalar(select(Host).where(Host.email == email))
     if not owner:
         return False
 
     new_otp = generate_otp()
     expires_at = datetime.utcnow() + timedelta(minutes=5)
 
-    otp_record = db.query(OTPRecord).filter(
+    otp_record = await db.scalar(select(OTPRecord).where(
         OTPRecord.owner_id == owner.id,
         OTPRecord.owner_type == owner_type
-    ).first()
+    ))
 
     if otp_record:
         if otp_record.expires_at > datetime.utcnow():
@@ -182,7 +191,7 @@ async def send_otp(db:Session,email:str,message:str,owner_type:str="host"):
         else:
             otp_record.otp = new_otp
             otp_record.expires_at = expires_at
-            db.commit()
+            await db.commit()
             otp_to_send = new_otp
     else:
         otp_record = OTPRecord(
@@ -192,7 +201,7 @@ async def send_otp(db:Session,email:str,message:str,owner_type:str="host"):
             expires_at=expires_at
         )
         db.add(otp_record)
-        db.commit()
+        await db.commit()
         otp_to_send = new_otp
 
     email_sent = await send_email(owner.email, otp_to_send,message)
@@ -203,7 +212,7 @@ async def send_otp(db:Session,email:str,message:str,owner_type:str="host"):
 
 # ------------------ Password Reset ------------------
 
-async def password_reset(db:Session,email:str,new_password:str=None):
+async def password_reset(db:AsyncSession,email:str,new_password:str=None):
     try:
         host=await retrieve_host(db,"email",email)
         if not host:
@@ -213,7 +222,7 @@ async def password_reset(db:Session,email:str,new_password:str=None):
             return ErrorResponseModel("Missing Password", 400, "New password is required for reset")
         
         host.password=encrypt_password(new_password)
-        db.commit()
+        await db.commit()
         return ResponseModel({"email": email}, "Password reset successfully. You can now log in.")
 
     except Exception as e:
@@ -221,19 +230,19 @@ async def password_reset(db:Session,email:str,new_password:str=None):
 
 
 #---------------Verify OTP for password reset--------------
-async def verify_reset_otp_controller(db:Session,email:str,otp:str,owner_type="host"):
+async def verify_reset_otp_controller(db:AsyncSession,email:str,otp:str,owner_type="host"):
     print("come")
-    owner = db.query(Host).filter(Host.email == email).first()
+    owner = await db.scalar(select(Host).where(Host.email == email))
     
     if not owner:
         return ErrorResponseModel("Owner not found", 404, f"No {owner_type} with this email.")
     
     print(owner.id)
 
-    otp_record = db.query(OTPRecord).filter(
+    otp_record = await db.scalar(select(OTPRecord).where(
         OTPRecord.owner_id == owner.id,
         OTPRecord.owner_type == owner_type
-    ).first()
+    ))
 
     if not otp_record:
         return ErrorResponseModel("OTP not found", 404, "No OTP record found.")
@@ -242,11 +251,92 @@ async def verify_reset_otp_controller(db:Session,email:str,otp:str,owner_type="h
         return ErrorResponseModel("Invalid OTP", 400, "Incorrect OTP.")
 
     if otp_record.expires_at < datetime.utcnow():
-        db.delete(otp_record)
-        db.commit()
+        await db.delete(otp_record)
+        await db.commit()
         return ErrorResponseModel("Expired OTP", 400, "OTP has expired.")
 
     # OTP is valid — delete it and allow password reset
-    db.delete(otp_record)
-    db.commit()
+    await db.delete(otp_record)
+    await db.commit()
     return ResponseModel({"email": owner.email}, "OTP verified successfully. Proceed to reset password.")
+
+
+# ------------------ Host portfolio ------------------
+def _rate(part, whole):
+    return round(part / whole, 4) if whole else 0.0
+
+
+async def get_host_portfolio(db: AsyncSession, host_id: int):
+    """
+    Sales, tickets, fill rate and check-in rate of every event of a host,
+    and of all of them together. One query: bookings and tickets are
+    summed per event through the host_id and event_id indexes, joined to
+    the host's events, and ROLLUP adds the totals row. Returns None if the
+    host doesn't exist.
+    """
+    bookings = (
+        select(
+            Participant.event_id,
+            func.sum(Participant.payment).label("sales"),
+            func.sum(Participant.total_booked).label("tickets")
+        )
+        .where(Participant.host_id == host_id)
+        .group_by(Participant.event_id)
+        .subquery()
+    )
+    checkins = (
+        select(
+            QRCode.event_id,
+            func.count().label("issued"),
+            func.count().filter(QRCode.verified == "verified").label("checked_in")
+        )
+        .where(QRCode.event_id.in_(select(Event.id).where(Event.host_id == host_id)))
+        .group_by(QRCode.event_id)
+        .subquery()
+    )
+    event = (Event.id, Event.event_title, Event.event_date)
+    rows = (
+        await db.execute(
+            select(
+                *event,
+                func.sum(func.coalesce(bookings.c.sales, 0.0)).label("sales"),
+                func.sum(func.coalesce(bookings.c.tickets, 0)).label("tickets"),
+                func.sum(func.coalesce(Event.total_seat, 0)).label("total_seat"),
+                func.sum(func.coalesce(Event.filled_seat, 0)).label("filled_seat"),
+                func.sum(func.coalesce(checkins.c.issued, 0)).label("issued"),
+                func.sum(func.coalesce(checkins.c.checked_in, 0)).label("checked_in"),
+            )
+            .outerjoin(bookings, bookings.c.event_id == Event.id)
+            .outerjoin(checkins, checkins.c.event_id == Event.id)
+            .where(Event.host_id == host_id)
+            .group_by(func.rollup(tuple_(*event)))
+            .order_by(Event.event_date, Event.id)
+        )
+    ).all()
+
+    def figures(row):
+        return {
+            "sales": float(row.sales or 0.0),
+            "tickets": int(row.tickets or 0),
+            "total_seat": int(row.total_seat or 0),
+            "filled_seat": int(row.filled_seat or 0),
+            "fill_rate": _rate(row.filled_seat or 0, row.total_seat or 0),
+            "tickets_issued": int(row.issued or 0),
+            "checked_in": int(row.checked_in or 0),
+            "checkin_rate": _rate(row.checked_in or 0, row.issued or 0),
+        }
+
+    # ROLLUP always adds the totals row, the one without an event, even for no events
+    events = [
+        {"event_id": row.id, "event_title": row.event_title, "event_date": row.event_date, **figures(row)}
+        for row in rows if row.id is not None
+    ]
+    if not events and not await db.scalar(select(Host.id).where(Host.id == host_id)):
+        return None
+    total = next(row for row in rows if row.id is None)
+    return {
+        "host_id": host_id,
+        "events": events,
+        "total": {"events": len(events), **figures(total)},
+    }
+
@@ -0,0 +1,160 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict
+from sqlalchemy import select, update, delete, or_, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+from server.database import new_session
+from server.models.job_model import Job
+from server.constant_file import (job_batch_size,
+                                  job_poll_interval,
+                                  job_max_attempts,
+                                  job_retry_base_delay,
+                                  job_visibility_timeout,
+                                  job_dead_retention_days,
+                                  job_purge_interval)
+
+# kind -> async handler(db, payload)
+JOB_HANDLERS: Dict[str, Callable[[AsyncSession, Dict[str, Any]], Awaitable[Any]]] = {}
+
+
+def job_handler(kind: str):
+    def register(fn):
+        JOB_HANDLERS[kind] = fn
+        return fn
+    return register
+
+
+# ------------------ Enqueue ------------------
+def enqueue_job(db: AsyncSession, kind: str, payload: Dict[str, Any], run_at: datetime = None):
+    """
+    Adds a job to the caller's session. Nothing is committed here, so the
+    job becomes visible to workers together with the change that caused it.
+    """
+    job = Job(
+        kind=kind,
+        payload=payload,
+        status="queued",
+        attempts=0,
+        max_attempts=job_max_attempts,
+        run_at=run_at or datetime.utcnow(),
+    )
+    db.add(job)
+    return job
+
+
+# ------------------ Claim ------------------
+async def claim_jobs(db: AsyncSession, limit: int = job_batch_size):
+    now = datetime.utcnow()
+    runnable = (
+        select(Job.id)
+        .where(
+            or_(
+                and_(Job.status == "queued", Job.run_at <= now),
+                # Worker died while running it
+                and_(Job.status == "running", Job.locked_at < now - timedelta(seconds=job_visibility_timeout)),
+            )
+        )
+        .order_by(Job.run_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    stmt = (
+        update(Job)
+        .where(Job.id.in_(runnable))
+        .values(status="running", locked_at=now, attempts=Job.attempts + 1)
+        .returning(Job.id, Job.kind, Job.payload, Job.attempts, Job.max_attempts)
+        .execution_options(synchronize_session=False)
+    )
+    jobs = (await db.execute(stmt)).all()
+    await db.commit()
+    return jobs
+
+
+# ------------------ Run one job ------------------
+async def run_job(job):
+    db = new_session()
+    try:
+        handler = JOB_HANDLERS.get(job.kind)
+        if not handler:
+            raise ValueError(f"No handler registered for job kind '{job.kind}'")
+        await handler(db, job.payload)
+        # Finished jobs are not kept: the table only holds work still to do and dead letters
+        await db.execute(delete(Job).where(Job.id == job.id))
+        await db.commit()
+    except Exception as e:
+        print(f"Job {job.id} ({job.kind}) failed on attempt {job.attempts}: {e}")
+        if job.attempts >= job.max_attempts:
+            # Dead letter: kept for inspection, never picked up again
+            values = {"status": "dead", "finished_at": datetime.utcnow()}
+        else:
+            delay = job_retry_base_delay * 2 ** (job.attempts - 1)
+            values = {"status": "queued", "run_at": datetime.utcnow() + timedelta(seconds=delay)}
+        try:
+            await db.rollback()
+            await db.execute(
+                update(Job)
+                .where(Job.id == job.id)
+                .values(locked_at=None, last_error=str(e)[:2000], **values)
+            )
+            await db.commit()
+        except Exception as record_error:
+            # Still "running": claimed again once job_visibility_timeout has passed
+            print(f"Job {job.id} ({job.kind}) failure could not be recorded: {record_error}")
+    finally:
+        await db.close()
+
+
+# ------------------ Retention ------------------
+async def purge_finished_jobs(db: AsyncSession, retention_days: int = job_dead_retention_days):
+    """
+    Deletes dead letters older than the retention period, and jobs marked
+    "done" by workers that kept finished jobs around.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    result = await db.execute(
+        delete(Job).where(
+            or_(
+                Job.status == "done",
+                and_(Job.status == "dead", Job.finished_at < cutoff),
+            )
+        )
+    )
+    await db.commit()
+    return result.rowcount
+
+
+# ------------------ Worker loop ------------------
+async def run_job_worker(batch_size: int = job_batch_size, poll_interval: float = job_poll_interval):
+    purged_at = None
+    while True:
+        if purged_at is None or datetime.utcnow() - purged_at >= timedelta(seconds=job_purge_interval):
+            purged_at = datetime.utcnow()
+            db = new_session()
+            try:
+                await purge_finished_jobs(db)
+            except Exception as e:
+                await db.rollback()
+                print(f"Job purge failed: {e}")
+            finally:
+                await db.close()
+
+        db = new_session()
+        try:
+            jobs = await claim_jobs(db, batch_size)
+        except Exception as e:
+            print(f"Job claim failed: {e}")
+            jobs = []
+        finally:
+            await db.close()
+
+        if not jobs:
+            await asyncio.sleep(poll_interval)
+            continue
+
+        try:
+            await asyncio.gather(*(run_job(job) for job in jobs))
+        except Exception as e:
+            # The worker must outlive any one batch, or jobs silently stop running
+            print(f"Job batch failed: {e}")
+            await asyncio.sleep(poll_interval)
@@ -0,0 +1,123 @@
+import asyncio
+import queue
+import smtplib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.mime.base import MIMEBase
+from server.constant_file import (eventisa_email,
+                                  eventisa_email_password,
+                                  smtp_host,
+                                  smtp_port,
+                                  smtp_use_tls,
+                                  smtp_pool_size,
+                                  smtp_idle_check)
+
+
+class SMTPConnectionPool:
+    """
+    Keeps up to `size` logged-in SMTP connections open and reuses them, so
+    a message costs one MAIL/RCPT/DATA exchange instead of a fresh TCP,
+    STARTTLS and AUTH handshake. Sends run on a dedicated executor with one
+    thread per connection, which also caps concurrent sends at `size`.
+    """
+
+    def __init__(self, host=smtp_host, port=smtp_port, username=eventisa_email,
+                 password=eventisa_email_password, use_tls=smtp_use_tls,
+                 size=smtp_pool_size, idle_check=smtp_idle_check):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.idle_check = idle_check
+        self._idle = queue.LifoQueue()
+        self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix="smtp")
+
+    def _connect(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=30)
+        if self.use_tls:
+            server.starttls()
+        if self.password:
+            server.login(self.username, self.password)
+        return server
+
+    @staticmethod
+    def _close(server):
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+
+    def _acquire(self):
+        while True:
+            try:
+                server, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+
+            if time.monotonic() - last_used < self.idle_check:
+                return server
+            # Servers drop idle sessions; make sure this one is still alive
+            try:
+                if server.noop()[0] == 250:
+                    return server
+            except Exception:
+                pass
+            self._close(server)
+
+    def _release(self, server):
+        self._idle.put((server, time.monotonic()))
+
+    def send_blocking(self, message: MIMEBase, to_addrs):
+        payload = message.as_string()
+        for attempt in (1, 2):
+            server = self._acquire()
+            try:
+                server.sendmail(self.username, to_addrs, payload)
+            except (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError) as e:
+                retry = e
+            except smtplib.SMTPException as e:
+                # Refused recipient, rejected data...: the message failed, the
+                # session didn't (smtplib resets it), unless the server is closing it
+                if getattr(e, "smtp_code", None) == 421:
+                    self._close(server)
+                else:
+                    self._release(server)
+                raise
+            except OSError as e:
+                # Socket error (SMTPException is an OSError too, handled above)
+                retry = e
+            except Exception:
+                self._close(server)
+                raise
+            else:
+                self._release(server)
+                return True
+
+            # Stale connection: drop it and retry once on a fresh one
+            self._close(server)
+            if attempt == 2:
+                raise retry
+
+    async def send(self, message: MIMEBase, to_addrs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.send_blocking, message, to_addrs)
+
+    def close(self):
+        while True:
+            try:
+                server, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._close(server)
+
+
+mail_pool = SMTPConnectionPool()
+
+
+async def send_mail(message: MIMEBase, to_addrs):
+    """Send a prepared message through the shared pool. Raises on failure."""
+    return await mail_pool.send(message, to_addrs)
@@ -0,0 +1,101 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import select, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from server.database import new_session
+from server.models.outbox_model import OutboxEvent
+from server.models.participant_model import Participant
+from server.constant_file import outbox_batch_size, outbox_poll_interval
+
+# Only one relay (across all workers) reads the outbox at a time, which keeps it in order
+OUTBOX_LOCK_KEY = 0x6F7574626F78
+
+# kind -> async handlers(payload), called in registration order
+OUTBOX_HANDLERS: Dict[str, List[Callable[[Dict[str, Any]], Awaitable[Any]]]] = {}
+
+
+def outbox_handler(kind: str):
+    def register(fn):
+        OUTBOX_HANDLERS.setdefault(kind, []).append(fn)
+        return fn
+    return register
+
+
+# ------------------ Record ------------------
+def add_outbox_event(db: AsyncSession, kind: str, payload: Dict[str, Any]):
+    """
+    Adds a change event to the caller's session. Like enqueue_job nothing
+    is committed here: the event exists exactly when the change it
+    describes does.
+    """
+    event = OutboxEvent(kind=kind, payload=jsonable_encoder(payload))
+    db.add(event)
+    return event
+
+
+def add_booking_events(db: AsyncSession, participants: List[Participant]):
+    for participant in participants:
+        add_outbox_event(db, "participant_added", {
+            "id": participant.id,
+            "host_id": participant.host_id,
+            "event_id": participant.event_id,
+            "user_id": participant.user_id,
+            "total_booked": participant.total_booked,
+            "payment": participant.payment,
+            "due": participant.due,
+            "payment_date": participant.payment_date,
+            "payment_time": participant.payment_time,
+        })
+
+
+# ------------------ Relay ------------------
+async def relay_outbox(db: AsyncSession, batch_size: int = outbox_batch_size):
+    """
+    Hands the oldest committed events to their handlers, in id order, and
+    deletes them. Returns how many were relayed, or None if another worker
+    holds the relay lock.
+
+    Delivery is at least once: if the process dies between the handlers
+    and the commit, the batch is relayed again. A handler that raises is
+    logged and does not hold up the events behind it.
+    """
+    if not await db.scalar(select(func.pg_try_advisory_xact_lock(OUTBOX_LOCK_KEY))):
+        await db.rollback()
+        return None
+
+    events = (
+        await db.execute(
+            select(OutboxEvent.id, OutboxEvent.kind, OutboxEvent.payload)
+            .order_by(OutboxEvent.id)
+            .limit(batch_size)
+        )
+    ).all()
+    for event in events:
+        for handler in OUTBOX_HANDLERS.get(event.kind, ()):
+            try:
+                await handler(event.payload)
+            except Exception as e:
+                print(f"Outbox handler {handler.__name__} failed on event {event.id} ({event.kind}): {e}")
+
+    if events:
+        await db.execute(delete(OutboxEvent).where(OutboxEvent.id.in_([event.id for event in events])))
+    await db.commit()
+    return len(events)
+
+
+async def run_outbox_relay(batch_size: int = outbox_batch_size, poll_interval: float = outbox_poll_interval):
+    while True:
+        db = new_session()
+        try:
+            relayed = await relay_outbox(db, batch_size)
+        except Exception as e:
+            await db.rollback()
+            print(f"Outbox relay failed: {e}")
+            relayed = None
+        finally:
+            await db.close()
+
+        # A full batch means there is more waiting
+        if relayed != batch_size:
+            await asyncio.sleep(poll_interval)
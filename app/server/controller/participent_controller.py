@@ -1,24 +1,94 @@
 from typing import Any, Dict
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from server.models.user_model import User
 from server.controller.qr_code_sender import send_qr_ticket_email
-from server.controller.qrcode_event_controller import add_qrcode_data
+from server.controller.qrcode_event_controller import insert_tickets
+from server.controller.outbox import add_booking_events, outbox_handler
+from server.controller.sales_rollup import add_daily_sales
+from server.controller.time_series import time_series
 from server.models.participant_model import * 
-from server.controller.ws_manager import participant_manager
+from server.controller.ws_manager import participant_manager, event_topic, host_topic, ADMIN_TOPIC
+from server.controller.flash_sale_manager import flash_sale_manager
 from datetime import datetime, timedelta
 from server.response_model import ResponseModel, ErrorResponseModel
-from server.controller.event_controller import update_event_seat_controller
 from server.controller.user_controller import retrieve_user_by_email, add_user
 from server.cryptography import encrypt_password
-from sqlalchemy import func
+from sqlalchemy import func, select, update, insert, literal, literal_column
 from server.models.event_model import *
+from server.models.sales_daily_model import SalesDaily
 import secrets
 
 
+# ------------------ Reserve seats and insert participant in one statement ------------------
+async def reserve_seats_and_add_participant(db: AsyncSession, participant_data: Dict[str, Any]):
+    """
+    Conditionally bumps events.filled_seat and inserts the participant in a
+    single round trip. Returns None when the event does not have enough
+    seats left, so concurrent bookings can never oversell.
+    """
+    seats = int(participant_data.get("total_booked") or 1)
+    if seats < 1:
+        raise ValueError("At least one seat must be booked")
+
+    filled = func.coalesce(Event.filled_seat, 0)
+    reserved = (
+        update(Event)
+        .where(
+            Event.id == participant_data["event_id"],
+            filled + seats <= Event.total_seat
+        )
+        .values(filled_seat=filled + seats)
+        .returning(Event.id, Event.event_price)
+        .cte("reserved")
+    )
+
+    stmt = (
+        insert(Participant)
+        .from_select(
+            ["host_id", "event_id", "user_id", "total_booked", "payment", "due", "payment_date", "payment_time"],
+            select(
+                literal(participant_data["host_id"], Participant.host_id.type),
+                reserved.c.id,
+                literal(participant_data["user_id"], Participant.user_id.type),
+                literal(seats, Participant.total_booked.type),
+                reserved.c.event_price * seats,
+                literal(participant_data.get("due") or 0.0, Participant.due.type),
+                literal(participant_data.get("payment_date"), Participant.payment_date.type),
+                literal(participant_data.get("payment_time"), Participant.payment_time.type),
+            )
+        )
+        .returning(Participant)
+    )
+
+    new_participant = (await db.scalars(stmt)).first()
+    if not new_participant:
+        await db.rollback()
+        return None
+
+    # Tickets, the sales rollup and the change event are written in the same transaction as the booking
+    await insert_tickets(db, [new_participant])
+    await add_daily_sales(db, [new_participant])
+    add_booking_events(db, [new_participant])
+    await db.commit()
+    return new_participant
+
+
+# ------------------ Book from a flash sale counter ------------------
+async def book_from_flash_sale(db: AsyncSession, participant_data: Dict[str, Any]):
+    """
+    Waits for the flash sale flusher, which writes the batch on its own
+    session. The request's session gives back its connection (or
+    ThreadedSession slot) first: a burst of waiting bookings holding them
+    all would leave the flusher none, and the batch could never be written.
+    """
+    await db.close()
+    return await flash_sale_manager.book(participant_data)
+
+
 # ------------------ Add New Participant ------------------
 
 
-async def add_participant_controller(db: Session, participant_data: Dict[str, Any]):
+async def add_participant_controller(db: AsyncSession, participant_data: Dict[str, Any]):
     
 
     # Normalize / compute payment date & time before creating the Participant
@@ -39,74 +109,47 @@ async def add_participant_controller(db: Session, participant_data: Dict[str, An
 
     
 
-    # Create participant
-    new_participant = Participant(**participant_payload)
-    user = db.query(User).filter(User.id == new_participant.user_id).first()
-    event = db.query(Event).filter(Event.id == new_participant.event_id).first()
-
-    new_participant.payment=event.event_price*new_participant.total_booked
-    print(new_participant.payment)
-
-    db.add(new_participant)
-    db.commit()
-    db.refresh(new_participant)
-
-    # Broadcast participant info (uses committed values)
-    await participant_manager.broadcast({
-        "event": "new_participant",
-        "data": {
-            "id": new_participant.id,
-            "host_id": new_participant.host_id,
-            "event_id": new_participant.event_id,
-            "user_id": new_participant.user_id,
-            "total_booked": new_participant.total_booked,
-            "payment": new_participant.payment,
-            "due": new_participant.due,
-            "payment_date": new_participant.payment_date,
-            "payment_time": new_participant.payment_time,
-        }
-    })
-
-    # Update event seats (expects {"booked": n})
-    await update_event_seat_controller(
-        db,
-        new_participant.event_id,
-        {"booked": new_participant.total_booked}
-    )
-
-    # Fetch related user & event objects for QR/email generation
-    
+    # Reserve seats and create participant (payment is computed from the event price)
+    if flash_sale_manager.is_active(participant_payload["event_id"]):
+        new_participant = await book_from_flash_sale(db, participant_payload)
+    else:
+        new_participant = await reserve_seats_and_add_participant(db, participant_payload)
+    if not new_participant:
+        raise ValueError("Event not found or not enough seats available")
 
-    # Ensure event and user were found (optional; raise or handle as needed)
-    if not user or not event:
-        # If you prefer raising exceptions, replace the return with raise
-        return new_participant
+    # Tickets, their email job and the outbox event were all written with the
+    # booking; the outbox relay broadcasts it
+    return new_participant
 
-    # Generate QR codes and send emails (function handles multiple tickets)
-    await add_qrcode_data(db, new_participant, user, event)
 
-    return new_participant
+# ------------------ Announce a stored booking ------------------
+@outbox_handler("participant_added")
+async def announce_booking(payload: Dict[str, Any]):
+    await participant_manager.broadcast(
+        {"event": "new_participant", "data": payload},
+        topics=[event_topic(payload["event_id"]), host_topic(payload["host_id"]), ADMIN_TOPIC]
+    )
 
 
 # ------------------ Retrieve ALL participants ------------------
-async def retrieve_all_participant_controller(db:Session):
+async def retrieve_all_participant_controller(db:AsyncSession):
     from sqlalchemy.orm import joinedload
-    return db.query(Participant).options(joinedload(Participant.user)).all()
+    return (await db.scalars(select(Participant).options(joinedload(Participant.user)))).all()
 
 
 # ------------------ Retrieve participant by host/event/participant id ------------------
-async def retrieve_participant_controller(db:Session,field:str,value:str):
+async def retrieve_participant_controller(db:AsyncSession,field:str,value:str):
     try:
         from sqlalchemy.orm import joinedload
         
         if field=="host_id":
-            return db.query(Participant).options(joinedload(Participant.user)).filter(Participant.host_id==int(value)).all()
+            return (await db.scalars(select(Participant).options(joinedload(Participant.user)).where(Participant.host_id==int(value)))).all()
         
         if field=="event_id":
-            return db.query(Participant).options(joinedload(Participant.user)).filter(Participant.event_id==int(value)).all()
+            return (await db.scalars(select(Participant).options(joinedload(Participant.user)).where(Participant.event_id==int(value)))).all()
         
         if field=="user_id":
-            return db.query(Participant).options(joinedload(Participant.user)).filter(Participant.user_id==int(value)).all()
+            return (await db.scalars(select(Participant).options(joinedload(Participant.user)).where(Participant.user_id==int(value)))).all()
         
     except Exception as e:
         return e.str()
@@ -115,195 +158,54 @@ async def retrieve_participant_controller(db:Session,field:str,value:str):
 # ----------------------- Analysis part ---------------------
 
 # ------------------ Analysis daily sales for event ------------------
-async def get_daily_sales_for_event(db: Session, event_id: int):
-    results = (
-        db.query(
-            func.date(Participant.payment_date).label("date"),
-            func.sum(Participant.payment).label("total_payment")
-        )
-        .filter(
-            Participant.event_id == event_id,
-            Participant.payment_date.isnot(None)
-        )
-        .group_by(func.date(Participant.payment_date))
-        .order_by(func.date(Participant.payment_date))
-        .all()
+# The analytics read sales_daily (one row per event and payment day, see
+# sales_rollup) instead of grouping every participant on each request.
+# start/end/granularity/columns are those of time_series.
+async def get_daily_sales_for_event(db: AsyncSession, event_id: int, **period):
+    return await time_series(
+        db, SalesDaily.day, {"total_payment": func.sum(SalesDaily.revenue)},
+        SalesDaily.event_id == event_id, **period
     )
 
-    if not results:
-        return []
-
-    # Convert to dictionary
-    sales_by_date = {
-        r.date: float(r.total_payment or 0.0)
-        for r in results
-    }
-
-    # Get full date range
-    start_date = min(sales_by_date.keys())
-    end_date = max(sales_by_date.keys())
-
-    # Fill missing days
-    daily_sales = []
-    current_date = start_date
-    while current_date <= end_date:
-        total_payment = sales_by_date.get(current_date, 0.0)
-        daily_sales.append({
-            "date": current_date.strftime("%Y-%m-%d"),
-            "total_payment": total_payment
-        })
-        current_date += timedelta(days=1)
-
-    return daily_sales
-
 
 # ------------------ Analysis daily sales for category ------------------
 
-async def get_daily_sales_for_category(db: Session, category: str):
-    results = (
-        db.query(
-            func.date(Participant.payment_date).label("date"),
-            func.sum(Participant.payment).label("total_payment")
-        )
-        .join(Event, Participant.event_id == Event.id)
-        .filter(
-            Event.event_category == category,
-            Participant.payment_date.isnot(None)
-        )
-        .group_by(func.date(Participant.payment_date))
-        .order_by(func.date(Participant.payment_date))
-        .all()
+async def get_daily_sales_for_category(db: AsyncSession, category: str, **period):
+    return await time_series(
+        db, SalesDaily.day, {"total_payment": func.sum(SalesDaily.revenue)},
+        SalesDaily.category == category, **period
     )
 
-    if not results:
-        return []
-
-    # Convert to dictionary
-    sales_by_date = {
-        r.date: float(r.total_payment or 0.0)
-        for r in results
-    }
-
-    # Get full date range
-    start_date = min(sales_by_date.keys())
-    end_date = max(sales_by_date.keys())
-
-    # Fill missing days
-    daily_sales = []
-    current_date = start_date
-    while current_date <= end_date:
-        total_payment = sales_by_date.get(current_date, 0.0)
-        daily_sales.append({
-            "date": current_date.strftime("%Y-%m-%d"),
-            "total_payment": total_payment
-        })
-        current_date += timedelta(days=1)
-
-    return daily_sales
-
 # ------------------ Analysis daily sales for total sale ------------------
 
 
-async def get_daily_total_sales(db: Session):
-    results = (
-        db.query(
-            func.date(Participant.payment_date).label("date"),
-            func.sum(Participant.payment).label("total_payment")
-        )
-        .filter(Participant.payment_date.isnot(None))
-        .group_by(func.date(Participant.payment_date))
-        .order_by(func.date(Participant.payment_date))
-        .all()
-    )
-
-    print(results)
-
-    if not results:
-        return []
-
-    # Convert to dictionary
-    sales_by_date = {
-        r.date: float(r.total_payment or 0.0)
-        for r in results
-    }
-
-    # Determine full date range
-    start_date = min(sales_by_date.keys())
-    end_date = max(sales_by_date.keys())
-
-    # Fill missing days
-
-    print("come")
-    daily_sales = []
-    current_date = start_date
-    while current_date <= end_date:
-        total_payment = sales_by_date.get(current_date, 0.0)
-        daily_sales.append({
-            "date": current_date.strftime("%Y-%m-%d"),
-            "total_payment": total_payment
-        })
-        current_date += timedelta(days=1)
-
-    return daily_sales
+async def get_daily_total_sales(db: AsyncSession, **period):
+    return await time_series(db, SalesDaily.day, {"total_payment": func.sum(SalesDaily.revenue)}, **period)
 
 
 
 #---------- Daily Participant Report (number of participants who paid)----------
-async def get_daily_participants_for_event(db: Session, event_id: int):
-    results = (
-        db.query(
-            func.date(Participant.payment_date).label("date"),
-            func.sum(Participant.total_booked).label("total_participants")
-        )
-        .filter(
-            Participant.event_id == event_id,
-            Participant.payment_date.isnot(None)
-        )
-        .group_by(func.date(Participant.payment_date))
-        .order_by(func.date(Participant.payment_date))
-        .all()
+async def get_daily_participants_for_event(db: AsyncSession, event_id: int, **period):
+    return await time_series(
+        db, SalesDaily.day, {"total_participants": func.sum(SalesDaily.tickets)},
+        SalesDaily.event_id == event_id, **period
     )
 
-    if not results:
-        return []
-
-    # Convert to dictionary
-    participants_by_date = {
-        r.date: r.total_participants
-        for r in results
-    }
-
-    # Get full date range
-    start_date = min(participants_by_date.keys())
-    end_date = max(participants_by_date.keys())
-
-    # Fill missing days
-    daily_participants = []
-    current_date = start_date
-    while current_date <= end_date:
-        total_participants = participants_by_date.get(current_date, 0)
-        daily_participants.append({
-            "date": current_date.strftime("%Y-%m-%d"),
-            "total_participants": total_participants
-        })
-        current_date += timedelta(days=1)
-
-    return daily_participants
-
 #--------------- Category wise sale --------------------
 
-async def get_total_sale_category_wise(db: Session, category: str):
+async def get_total_sale_category_wise(db: AsyncSession, category: str):
     
     results = (
-        db.query(
-            func.sum(Participant.payment).label("total_sale"),
-            func.sum(Participant.total_booked).label("total_participants"),
-            func.count(func.distinct(Event.id)).label("total_events")
+        await db.execute(
+            select(
+                func.sum(Participant.payment).label("total_sale"),
+                func.sum(Participant.total_booked).label("total_participants"),
+                func.count(func.distinct(Event.id)).label("total_events")
+            )
+            .join(Event, Participant.event_id == Event.id)
+            .where(Event.event_category == category)
         )
-        .join(Event, Participant.event_id == Event.id)
-        .filter(Event.event_category == category)
-        .first()
-    )
+    ).first()
 
     return {
         "total_sale": float(results.total_sale or 0.0),
@@ -311,20 +213,21 @@ async def get_total_sale_category_wise(db: Session, category: str):
     }
 
 #--------------- Total Sale (Event-wise) --------------------
-async def get_total_sale_event_wise(db: Session, event_id: int):
+async def get_total_sale_event_wise(db: AsyncSession, event_id: int):
     
     results = (
-        db.query(
-            Event.id.label("event_id"),
-            Event.event_title.label("event_title"),
-            func.sum(Participant.payment).label("total_sale"),
-            func.sum(Participant.total_booked).label("total_participants")
+        await db.execute(
+            select(
+                Event.id.label("event_id"),
+                Event.event_title.label("event_title"),
+                func.sum(Participant.payment).label("total_sale"),
+                func.sum(Participant.total_booked).label("total_participants")
+            )
+            .join(Participant, Participant.event_id == Event.id)
+            .where(Event.id == event_id)
+            .group_by(Event.id, Event.event_title)
         )
-        .join(Participant, Participant.event_id == Event.id)
-        .filter(Event.id == event_id)
-        .group_by(Event.id, Event.event_title)
-        .first()
-    )
+    ).first()
 
     if not results:
         return {
@@ -341,17 +244,20 @@ async def get_total_sale_event_wise(db: Session, event_id: int):
 
 #---------------- monthly total sale-------------
 
-async def get_monthly_total_sale(db: Session):
+# One bound expression: asyncpg would bind each "month" literal as its own
+# parameter and Postgres then rejects the GROUP BY
+SALES_MONTH = func.date_trunc(literal_column("'month'"), SalesDaily.day)
+
+
+async def _monthly_sales(db: AsyncSession, *criteria):
     results = (
-        db.query(
-            func.date_trunc("month", Participant.payment_date).label("month"),
-            func.sum(Participant.payment).label("total_payment")
+        await db.execute(
+            select(SALES_MONTH.label("month"), func.sum(SalesDaily.revenue).label("total_payment"))
+            .where(*criteria)
+            .group_by(SALES_MONTH)
+            .order_by(SALES_MONTH)
         )
-        .filter(Participant.payment_date.isnot(None))
-        .group_by(func.date_trunc("month", Participant.payment_date))
-        .order_by(func.date_trunc("month", Participant.payment_date))
-        .all()
-    )
+    ).all()
 
     return [
         {"date": r.month.strftime("%b'%y"), "total_payment": float(r.total_payment or 0.0)}
@@ -359,55 +265,24 @@ async def get_monthly_total_sale(db: Session):
     ]
 
 
-#------------------- monthly sale category wise ---------------
+async def get_monthly_total_sale(db: AsyncSession):
+    return await _monthly_sales(db)
 
 
-async def get_monthly_category_sale(db: Session, category: str):
-    results = (
-        db.query(
-            func.date_trunc("month", Participant.payment_date).label("month"),
-            func.sum(Participant.payment).label("total_payment")
-        )
-        .join(Event, Participant.event_id == Event.id)
-        .filter(
-            Event.event_category == category,
-            Participant.payment_date.isnot(None)
-        )
-        .group_by(func.date_trunc("month", Participant.payment_date))
-        .order_by(func.date_trunc("month", Participant.payment_date))
-        .all()
-    )
+#------------------- monthly sale category wise ---------------
 
-    return [
-        {"date": r.month.strftime("%b'%y"), "total_payment": float(r.total_payment or 0.0)}
-        for r in results
-    ]
 
+async def get_monthly_category_sale(db: AsyncSession, category: str):
+    return await _monthly_sales(db, SalesDaily.category == category)
 
-#--------------- monthly sale event wise -----------------------
 
-async def get_monthly_event_sale(db: Session, event_id: int):
-    results = (
-        db.query(
-            func.date_trunc("month", Participant.payment_date).label("month"),
-            func.sum(Participant.payment).label("total_payment")
-        )
-        .filter(
-            Participant.event_id == event_id,
-            Participant.payment_date.isnot(None)
-        )
-        .group_by(func.date_trunc("month", Participant.payment_date))
-        .order_by(func.date_trunc("month", Participant.payment_date))
-        .all()
-    )
+#--------------- monthly sale event wise -----------------------
 
-    return [
-        {"date": r.month.strftime("%b'%y"), "total_payment": float(r.total_payment or 0.0)}
-        for r in results
-    ]
+async def get_monthly_event_sale(db: AsyncSession, event_id: int):
+    return await _monthly_sales(db, SalesDaily.event_id == event_id)
 
 # ------------------ Add Participant with Guest Booking (finds or creates user) ------------------
-async def add_participant_guest_controller(db: Session, booking_data: Dict[str, Any]):
+async def add_participant_guest_controller(db: AsyncSession, booking_data: Dict[str, Any]):
     """
     Handles guest bookings by finding or creating a user account,
     then creating the participant record.
@@ -451,16 +326,14 @@ async def add_participant_guest_controller(db: Session, booking_data: Dict[str,
             user.name = name
         if phone and phone != user.phone_number:
             user.phone_number = phone
-        db.commit()
-        db.refresh(user)
+        await db.commit()
+        await db.refresh(user)
         
-        # Get event to calculate payment
-        event = db.query(Event).filter(Event.id == event_id).first()
+        # Make sure the event exists
+        event = await db.scalar(select(Event).where(Event.id == event_id))
         if not event:
             raise ValueError("Event not found")
         
-        # Calculate payment
-        payment = event.event_price * total_booked
         payment_date = datetime.utcnow()
         payment_time = payment_date.strftime("%H:%M:%S")
         
@@ -470,45 +343,22 @@ async def add_participant_guest_controller(db: Session, booking_data: Dict[str,
             "event_id": event_id,
             "user_id": user.id,
             "total_booked": total_booked,
-            "payment": payment,
             "due": 0.0,
             "payment_date": payment_date,
             "payment_time": payment_time
         }
         
-        new_participant = Participant(**participant_data)
-        db.add(new_participant)
-        db.commit()
-        db.refresh(new_participant)
-        
-        # Broadcast participant info
-        await participant_manager.broadcast({
-            "event": "new_participant",
-            "data": {
-                "id": new_participant.id,
-                "host_id": new_participant.host_id,
-                "event_id": new_participant.event_id,
-                "user_id": new_participant.user_id,
-                "total_booked": new_participant.total_booked,
-                "payment": new_participant.payment,
-                "due": new_participant.due,
-                "payment_date": new_participant.payment_date,
-                "payment_time": new_participant.payment_time,
-            }
-        })
-        
-        # Update event seats
-        await update_event_seat_controller(
-            db,
-            new_participant.event_id,
-            {"booked": new_participant.total_booked}
-        )
-        
-        # Generate QR codes and send emails
-        await add_qrcode_data(db, new_participant, user, event)
+        # Reserve seats and create participant (payment is computed from the event price)
+        if flash_sale_manager.is_active(event_id):
+            new_participant = await book_from_flash_sale(db, participant_data)
+        else:
+            new_participant = await reserve_seats_and_add_participant(db, participant_data)
+        if not new_participant:
+            raise ValueError("Event not found or not enough seats available")
         
+        # Tickets, their email job and the outbox event were written with the booking
         return new_participant
         
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise e
\ No newline at end of file
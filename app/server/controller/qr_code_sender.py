@@ -1,29 +1,77 @@
-import asyncio
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.image import MIMEImage
-import smtplib
+from server.controller.mail_transport import send_mail
 from datetime import datetime
-import base64
-from server.constant_file import eventisa_email, eventisa_email_password
+from server.constant_file import eventisa_email
+
+
+TICKET_EMAIL_STYLE = """
+            body {
+                font-family: 'Segoe UI', Arial, sans-serif;
+                background-color: #f4f6f9;
+                color: #333;
+                margin: 0;
+                padding: 0;
+            }
+            .ticket-container {
+                background-color: #fff;
+                border: 2px solid #007bff;
+                border-radius: 15px;
+                padding: 25px;
+                margin: 30px auto;
+                width: 600px;
+                box-shadow: 0 4px 10px rgba(0,0,0,0.1);
+            }
+            .header {
+                text-align: center;
+                color: #007bff;
+                font-size: 24px;
+                font-weight: bold;
+                margin-bottom: 15px;
+            }
+            .details {
+                text-align: center;
+                font-size: 16px;
+                margin-bottom: 20px;
+            }
+            .qr-code {
+                text-align: center;
+                margin: 20px 0;
+            }
+            .footer {
+                text-align: center;
+                font-size: 14px;
+                color: #666;
+            }
+"""
+
+
+def _safe_format(value, fmt):
+    if isinstance(value, datetime):
+        return value.strftime(fmt)
+    try:
+        return datetime.fromisoformat(str(value)).strftime(fmt)
+    except Exception:
+        return str(value)
+
+
+def _qr_image(ticket_no: int, qr_png: bytes, cid: str):
+    # Attach the rendered QR as inline image
+    img = MIMEImage(qr_png, name=f"ticket_{ticket_no}.png")
+    img.add_header('Content-ID', f'<{cid}>')
+    img.add_header('Content-Disposition', 'inline', filename=f"ticket_{ticket_no}.png")
+    return img
 
 
 async def send_qr_ticket_email(email: str, user_name: str, event_name: str,
                                event_location: str, event_date, event_time,
-                               ticket_no: int, qr_data: str):
+                               ticket_no: int, qr_png: bytes):
 
-    def send_blocking_email():
+    def build_email():
         try:
-            def safe_format(value, fmt):
-                if isinstance(value, datetime):
-                    return value.strftime(fmt)
-                try:
-                    return datetime.fromisoformat(str(value)).strftime(fmt)
-                except Exception:
-                    return str(value)
-
-            formatted_date = safe_format(event_date, '%B %d, %Y')
-            formatted_time = safe_format(event_time, '%I:%M %p')
+            formatted_date = _safe_format(event_date, '%B %d, %Y')
+            formatted_time = _safe_format(event_time, '%I:%M %p')
 
             message = MIMEMultipart("related")
             message['From'] = eventisa_email
@@ -34,45 +82,7 @@ async def send_qr_ticket_email(email: str, user_name: str, event_name: str,
             html_body = f"""
             <html>
             <head>
-                <style>
-                    body {{
-                        font-family: 'Segoe UI', Arial, sans-serif;
-                        background-color: #f4f6f9;
-                        color: #333;
-                        margin: 0;
-                        padding: 0;
-                    }}
-                    .ticket-container {{
-                        background-color: #fff;
-                        border: 2px solid #007bff;
-                        border-radius: 15px;
-                        padding: 25px;
-                        margin: 30px auto;
-                        width: 600px;
-                        box-shadow: 0 4px 10px rgba(0,0,0,0.1);
-                    }}
-                    .header {{
-                        text-align: center;
-                        color: #007bff;
-                        font-size: 24px;
-                        font-weight: bold;
-                        margin-bottom: 15px;
-                    }}
-                    .details {{
-                        text-align: center;
-                        font-size: 16px;
-                        margin-bottom: 20px;
-                    }}
-                    .qr-code {{
-                        text-align: center;
-                        margin: 20px 0;
-                    }}
-                    .footer {{
-                        text-align: center;
-                        font-size: 14px;
-                        color: #666;
-                    }}
-                </style>
+                <style>{TICKET_EMAIL_STYLE}</style>
             </head>
             <body>
                 <div class="ticket-container">
@@ -101,25 +111,100 @@ async def send_qr_ticket_email(email: str, user_name: str, event_name: str,
             alt.attach(MIMEText(html_body, 'html'))
             message.attach(alt)
 
-            # Decode base64 QR and attach as inline image
-            qr_bytes = base64.b64decode(qr_data)
-            img = MIMEImage(qr_bytes, name=f"ticket_{ticket_no}.png")
-            img.add_header('Content-ID', '<qrimage>')
-            img.add_header('Content-Disposition', 'inline', filename=f"ticket_{ticket_no}.png")
-            message.attach(img)
+            message.attach(_qr_image(ticket_no, qr_png, "qrimage"))
+            return message
+
+        except Exception as e:
+            print(f"❌ Error while building ticket {ticket_no}: {e}")
+            return None
+
+    message = build_email()
+    if message is None:
+        return False
+    try:
+        await send_mail(message, email)
+        print(f"✅ Ticket #{ticket_no} with QR sent to {email}")
+        return True
+    except Exception as e:
+        print(f"❌ SMTP Error while sending ticket {ticket_no}: {e}")
+        return False
+
+
+
+async def send_qr_tickets_email(email: str, user_name: str, event_name: str,
+                                event_location: str, event_date, event_time,
+                                tickets: list):
+    """
+    Send every ticket of one booking in a single message.
+    `tickets` is a list of (ticket_no, qr_png) pairs; each QR is embedded
+    inline with its own Content-ID.
+    """
+
+    def build_email():
+        try:
+            formatted_date = _safe_format(event_date, '%B %d, %Y')
+            formatted_time = _safe_format(event_time, '%I:%M %p')
+
+            message = MIMEMultipart("related")
+            message['From'] = eventisa_email
+            message['To'] = email
+            if len(tickets) == 1:
+                message['Subject'] = f"{event_name} - Your Ticket #{tickets[0][0]}"
+            else:
+                message['Subject'] = f"{event_name} - Your {len(tickets)} Tickets"
+
+            qr_blocks = "".join(
+                f"""
+                    <div class="qr-code">
+                        <p><b>Ticket #{ticket_no}</b></p>
+                        <img src="cid:qrimage{ticket_no}" alt="QR Code Ticket {ticket_no}" width="200" height="200"/>
+                    </div>"""
+                for ticket_no, _ in tickets
+            )
+
+            html_body = f"""
+            <html>
+            <head>
+                <style>{TICKET_EMAIL_STYLE}</style>
+            </head>
+            <body>
+                <div class="ticket-container">
+                    <div class="header">{event_name} - Ticket Confirmation</div>
+                    <div class="details">
+                        <p>Hi <b>{user_name}</b>,</p>
+                        <p>Thank you for booking! Here are your <b>{len(tickets)}</b> ticket(s).</p>
+                        <p>📍 <b>Location:</b> {event_location}<br>
+                           📅 <b>Date:</b> {formatted_date}<br>
+                           ⏰ <b>Time:</b> {formatted_time}</p>
+                    </div>{qr_blocks}
+                    <div class="footer">
+                        Each QR code admits one person. Please show them at the event entrance.<br>
+                        Wishing you a fantastic experience! 🎉
+                    </div>
+                </div>
+            </body>
+            </html>
+            """
 
-            # Send email
-            server = smtplib.SMTP('smtp.gmail.com', 587)
-            server.starttls()
-            server.login(eventisa_email, eventisa_email_password)
-            server.sendmail(eventisa_email, email, message.as_string())
-            server.quit()
+            alt = MIMEMultipart("alternative")
+            alt.attach(MIMEText(html_body, 'html'))
+            message.attach(alt)
 
-            print(f"✅ Ticket #{ticket_no} with QR sent to {email}")
-            return True
+            for ticket_no, qr_png in tickets:
+                message.attach(_qr_image(ticket_no, qr_png, f"qrimage{ticket_no}"))
+            return message
 
         except Exception as e:
-            print(f"❌ SMTP Error while sending ticket {ticket_no}: {e}")
-            return False
+            print(f"❌ Error while building tickets for {email}: {e}")
+            return None
 
-    return await asyncio.to_thread(send_blocking_email)
+    message = build_email()
+    if message is None:
+        return False
+    try:
+        await send_mail(message, email)
+        print(f"✅ {len(tickets)} ticket(s) with QR sent to {email}")
+        return True
+    except Exception as e:
+        print(f"❌ SMTP Error while sending tickets to {email}: {e}")
+        return False
@@ -0,0 +1,154 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from io import BytesIO
+from typing import List, Tuple
+import qrcode
+from PIL import Image
+from server.constant_file import (qr_render_workers,
+                                  qr_render_chunk_size,
+                                  qr_render_cache_size,
+                                  qr_matrix_cache_size,
+                                  qr_error_correction,
+                                  qr_mask_pattern,
+                                  qr_box_size,
+                                  qr_border,
+                                  qr_format)
+
+ERROR_CORRECTION = {
+    "L": qrcode.constants.ERROR_CORRECT_L,
+    "M": qrcode.constants.ERROR_CORRECT_M,
+    "Q": qrcode.constants.ERROR_CORRECT_Q,
+    "H": qrcode.constants.ERROR_CORRECT_H,
+}
+
+MEDIA_TYPES = {"png": "image/png", "svg": "image/svg+xml"}
+
+
+# ------------------ Module matrix ------------------
+@lru_cache(maxsize=qr_matrix_cache_size)
+def qr_matrix(payload: str, error_correction: str = qr_error_correction,
+              mask_pattern: int = qr_mask_pattern) -> Tuple[bytes, ...]:
+    """Dark (1) / light (0) modules, one bytes object per row, without border."""
+    qr = qrcode.QRCode(error_correction=ERROR_CORRECTION[error_correction], border=0,
+                       mask_pattern=mask_pattern)
+    qr.add_data(payload)
+    qr.make(fit=True)
+    return tuple(bytes(row) for row in qr.modules)
+
+
+# ------------------ Drawing ------------------
+def _draw_png(matrix, box_size: int, border: int) -> bytes:
+    # One pixel per module, then a nearest-neighbour upscale: much cheaper
+    # than drawing every module as a rectangle
+    size = len(matrix) + 2 * border
+    quiet = b"\xff" * size
+    rows = [quiet] * border
+    rows += [b"\xff" * border + bytes(0 if dark else 255 for dark in row) + b"\xff" * border for row in matrix]
+    rows += [quiet] * border
+    img = Image.frombytes("L", (size, size), b"".join(rows))
+    img = img.resize((size * box_size, size * box_size), Image.NEAREST).convert("1", dither=Image.Dither.NONE)
+    buffered = BytesIO()
+    img.save(buffered, format="PNG")
+    return buffered.getvalue()
+
+
+def _draw_svg(matrix, box_size: int, border: int) -> bytes:
+    # Horizontal runs of dark modules become one rectangle each
+    size = (len(matrix) + 2 * border) * box_size
+    path = []
+    for y, row in enumerate(matrix):
+        x = 0
+        while x < len(row):
+            if not row[x]:
+                x += 1
+                continue
+            start = x
+            while x < len(row) and row[x]:
+                x += 1
+            path.append(f"M{(start + border) * box_size},{(y + border) * box_size}"
+                        f"h{(x - start) * box_size}v{box_size}h-{(x - start) * box_size}z")
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{size}" height="{size}" viewBox="0 0 {size} {size}">'
+        f'<rect width="100%" height="100%" fill="#fff"/><path d="{"".join(path)}" fill="#000"/></svg>'
+    ).encode()
+
+
+def render_one(payload: str, fmt: str = qr_format, error_correction: str = qr_error_correction,
+               box_size: int = qr_box_size, border: int = qr_border) -> bytes:
+    matrix = qr_matrix(payload, error_correction)
+    if fmt == "svg":
+        return _draw_svg(matrix, box_size, border)
+    return _draw_png(matrix, box_size, border)
+
+
+def render_batch(payloads: List[str], fmt: str, error_correction: str, box_size: int, border: int) -> List[bytes]:
+    """Runs inside a pool process."""
+    return [render_one(payload, fmt, error_correction, box_size, border) for payload in payloads]
+
+
+@lru_cache(maxsize=qr_render_cache_size)
+def render_cached(payload: str, fmt: str = qr_format) -> bytes:
+    return render_one(payload, fmt)
+
+
+class QRRenderer:
+    """
+    Renders ticket QR codes off the event loop.
+
+    Batches are split into chunks and rendered in a process pool, so a
+    large booking uses every core instead of holding the GIL. Single
+    images (the on-demand ticket endpoint) are rendered in a thread and
+    cached, since shipping one payload to another process costs more than
+    drawing it. With `workers=0` batches are rendered in a thread too.
+    """
+
+    def __init__(self, workers: int = qr_render_workers, chunk_size: int = qr_render_chunk_size):
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self._pool = None
+
+    def _get_pool(self):
+        if self._pool is None:
+            # spawn: forking a process that runs an event loop and DB pools is unsafe
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+    async def render(self, payload: str, fmt: str = qr_format) -> bytes:
+        return await asyncio.to_thread(render_cached, payload, fmt)
+
+    async def render_many(self, payloads: List[str], fmt: str = qr_format,
+                          error_correction: str = qr_error_correction,
+                          box_size: int = qr_box_size, border: int = qr_border) -> List[bytes]:
+        if not payloads:
+            return []
+        options = (fmt, error_correction, box_size, border)
+        if self.workers <= 0 or len(payloads) <= 1:
+            return await asyncio.to_thread(render_batch, list(payloads), *options)
+
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool()
+        chunk = max(1, min(self.chunk_size, -(-len(payloads) // self.workers)))
+        try:
+            parts = await asyncio.gather(*(
+                loop.run_in_executor(pool, render_batch, payloads[i:i + chunk], *options)
+                for i in range(0, len(payloads), chunk)
+            ))
+        except BrokenProcessPool as e:
+            # A worker died; start a fresh pool next time and finish this batch here
+            print(f"QR render pool broken, rendering in a thread: {e}")
+            self.shutdown()
+            return await asyncio.to_thread(render_batch, list(payloads), *options)
+        return [image for part in parts for image in part]
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+qr_renderer = QRRenderer()
@@ -1,129 +1,383 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update, insert, func, and_, values, column, Integer, DateTime
+from sqlalchemy.ext.asyncio import AsyncSession
 from server.models.user_model import User
 from server.models.event_model import Event
-from server.controller.qr_code_sender import send_qr_ticket_email
+from server.controller.qr_code_sender import send_qr_ticket_email, send_qr_tickets_email
+from server.controller.job_queue import job_handler, enqueue_job
 from server.models.qrcode_model import QRCode
 from server.models.participant_model import Participant
+from server.cryptography import sign_ticket, read_ticket_token, ticket_digest
+from server.controller.qr_renderer import qr_renderer
+from server.constant_file import ticket_email_batched, checkin_sync_overlap
+from datetime import timedelta, timezone
 from datetime import datetime
-import qrcode
 import base64
-from io import BytesIO
 import re
 
-async def add_qrcode_data(db, participant:Participant,user:User,event:Event):
-    
-    host = participant.host_id
+# ------------------ Write the tickets of one or more bookings ------------------
+async def insert_tickets(db: AsyncSession, participants: list):
+    """
+    Writes every ticket of `participants` with a single bulk
+    INSERT ... RETURNING and queues their emails, inside the caller's
+    transaction (nothing is committed here). Ids are drawn from the
+    qrcodes sequence first because each token is signed over its id, so a
+    booking costs the same three round trips whatever its ticket count.
+    """
+    total = sum(p.total_booked for p in participants)
+    if not total:
+        return []
+
+    users = {
+        user.id: user
+        for user in (
+            await db.execute(
+                select(User.id, User.name, User.email)
+                .where(User.id.in_({p.user_id for p in participants}))
+            )
+        ).all()
+    }
+    ticket_ids = iter(
+        (
+            await db.scalars(
+                select(func.nextval(func.pg_get_serial_sequence("qrcodes", "id")))
+                .select_from(func.generate_series(1, total))
+            )
+        ).all()
+    )
 
-    print(participant.id)
+    now = datetime.utcnow()
+    rows = []
+    for participant in participants:
+        user = users[participant.user_id]
+        for ticket_no in range(1, participant.total_booked + 1):
+            ticket_id = next(ticket_ids)
+            rows.append({
+                "id": ticket_id,
+                "host_id": participant.host_id,
+                "event_id": participant.event_id,
+                "user_id": user.id,
+                "participant_id": participant.id,
+                "user_email": user.email,
+                "user_name": user.name,
+                "qr_data": sign_ticket(participant.event_id, ticket_id),
+                "created_at": now,
+            })
 
+            if not ticket_email_batched:
+                # Send one email per ticket (queued, committed together with the ticket)
+                enqueue_job(db, "send_ticket_email", {"qrcode_id": ticket_id, "ticket_no": ticket_no})
 
-    qr_codes = []
+        if ticket_email_batched:
+            # One email carrying every ticket of the booking
+            enqueue_job(db, "send_booking_tickets_email", {"participant_id": participant.id})
 
-    for ticket_no in range(1, participant.total_booked + 1):
-        qr_payload = (
-            f"uid:*{user.id}*"
-            f"uname:*{user.name}*"
-            f"eid:*{event.id}*"
-            f"ename:*{event.event_title}\n*"
-            f"ticket:*{participant.id}.{ticket_no}\n*"
-            f"uemail:*{user.email}*"
-            
+    return (
+        await db.execute(
+            insert(QRCode).returning(
+                QRCode.id, QRCode.participant_id, QRCode.event_id, QRCode.user_id, QRCode.qr_data,
+                sort_by_parameter_order=True
+            ),
+            rows
         )
+    ).all()
+
+
+async def add_qrcode_data(db, participant:Participant,user:User,event:Event):
+    tickets = await insert_tickets(db, [participant])
+    await db.commit()
+    return [
+        {
+            "id": ticket.id,
+            "ticket_no": ticket_no,
+            "participant_id": ticket.participant_id,
+            "event_id": ticket.event_id,
+            "user_id": ticket.user_id,
+            "qr_data": ticket.qr_data
+        }
+        for ticket_no, ticket in enumerate(tickets, start=1)
+    ]
+
+
+# ------------------ Ticket QR images ------------------
+async def ticket_qr_pngs(qr_datas: list) -> list:
+    """PNG for every stored qr_data, rendered as one batch in the QR process pool."""
+    is_token = [bool(read_ticket_token(qr_data)) for qr_data in qr_datas]
+    rendered = iter(await qr_renderer.render_many(
+        [qr_data for qr_data, token in zip(qr_datas, is_token) if token], fmt="png"
+    ))
+    # Tickets issued before signed tokens stored the base64 PNG itself
+    return [next(rendered) if token else base64.b64decode(qr_data) for qr_data, token in zip(qr_datas, is_token)]
+
 
-        qr_img = qrcode.make(qr_payload)
-        buffered = BytesIO()
-        qr_img.save(buffered, format="PNG")
-        qr_base64 = base64.b64encode(buffered.getvalue()).decode("utf-8")
-
-        new_qrcode = QRCode(
-            host_id=host,
-            event_id=event.id,
-            user_id=user.id,
-            participant_id=participant.id,
-            user_email=user.email,
-            user_name=user.name,
-            qr_data=qr_base64,
-            created_at=datetime.utcnow()
+# ------------------ Job: store tickets for a booking (queued by older releases) ------------------
+@job_handler("issue_tickets")
+async def issue_tickets_job(db: AsyncSession, payload: dict):
+    participant = await db.scalar(select(Participant).where(Participant.id == payload["participant_id"]))
+    if not participant:
+        return
+
+    # Retried job: tickets were already stored by an earlier attempt
+    issued = await db.scalar(select(func.count(QRCode.id)).where(QRCode.participant_id == participant.id))
+    if issued:
+        return
+
+    user = await db.scalar(select(User).where(User.id == participant.user_id))
+    event = await db.scalar(select(Event).where(Event.id == participant.event_id))
+    if not user or not event:
+        return
+
+    await add_qrcode_data(db, participant, user, event)
+
+
+# ------------------ Job: email one ticket ------------------
+@job_handler("send_ticket_email")
+async def send_ticket_email_job(db: AsyncSession, payload: dict):
+    qr_record = await db.scalar(select(QRCode).where(QRCode.id == payload["qrcode_id"]))
+    if not qr_record:
+        return
+    event = await db.scalar(select(Event).where(Event.id == qr_record.event_id))
+
+    sent = await send_qr_ticket_email(
+        email=qr_record.user_email,
+        user_name=qr_record.user_name,
+        event_name=event.event_title,
+        event_location=event.event_location,
+        event_date=event.event_date,
+        event_time=event.event_time,
+        ticket_no=payload["ticket_no"],
+        qr_png=(await ticket_qr_pngs([qr_record.qr_data]))[0]
+    )
+    if not sent:
+        raise RuntimeError(f"Could not send ticket #{payload['ticket_no']} to {qr_record.user_email}")
+
+
+# ------------------ Job: email all tickets of a booking ------------------
+@job_handler("send_booking_tickets_email")
+async def send_booking_tickets_email_job(db: AsyncSession, payload: dict):
+    qr_records = (
+        await db.scalars(
+            select(QRCode)
+            .where(QRCode.participant_id == payload["participant_id"])
+            .order_by(QRCode.id)
         )
-        db.add(new_qrcode)
-        db.commit()
-        db.refresh(new_qrcode)
-
-
-        print("come 1")
-
-        # Send one email per ticket
-        await send_qr_ticket_email(
-            email=user.email,
-            user_name=user.name,
-            event_name=event.event_title,
-            event_location=event.event_location,
-            event_date=event.event_date,
-            event_time=event.event_time,
-            ticket_no=ticket_no,
-            qr_data=qr_base64
+    ).all()
+    if not qr_records:
+        return
+    event = await db.scalar(select(Event).where(Event.id == qr_records[0].event_id))
+
+    sent = await send_qr_tickets_email(
+        email=qr_records[0].user_email,
+        user_name=qr_records[0].user_name,
+        event_name=event.event_title,
+        event_location=event.event_location,
+        event_date=event.event_date,
+        event_time=event.event_time,
+        tickets=list(enumerate(await ticket_qr_pngs([qr.qr_data for qr in qr_records]), start=1))
+    )
+    if not sent:
+        raise RuntimeError(f"Could not send tickets of booking {payload['participant_id']} to {qr_records[0].user_email}")
+
+
+# ------------------ Check in one ticket ------------------
+async def check_in_ticket(db: AsyncSession, ticket, ticket_text: str):
+    """
+    Marks the ticket matched by `ticket` as used with one conditional
+    UPDATE ... RETURNING. Only one of several concurrent scans of the same
+    ticket can match `verified <> 'verified'`, so admission is exactly once
+    across gates and workers.
+    """
+    row = (
+        await db.execute(
+            update(QRCode)
+            .where(ticket, QRCode.verified.is_distinct_from("verified"), Event.id == QRCode.event_id)
+            .values(verified="verified", scanned_at=datetime.utcnow())
+            .returning(
+                QRCode.user_id, QRCode.user_name, QRCode.user_email, QRCode.scanned_at,
+                Event.id.label("event_id"), Event.event_title, Event.event_location, Event.event_date
+            )
+            .execution_options(synchronize_session=False)
         )
+    ).first()
+    await db.commit()
+
+    if not row:
+        # Nothing updated: either no such ticket or it was already used
+        if await db.scalar(select(QRCode.id).where(ticket)) is None:
+            return {"status": "invalid", "message": "Ticket not found."}
+        return {"status": "reused", "message": "This ticket has already been used."}
+
+    # Check event date
+    if row.event_date and isinstance(row.event_date, datetime):
+        if row.event_date < datetime.utcnow():
+            return {"status": "expired", "message": "Event date has passed."}
+
+    return {
+        "status": "valid",
+        "message": "QR verified successfully.",
+        "user": {"id": row.user_id, "name": row.user_name, "email": row.user_email},
+        "event": {
+            "id": row.event_id,
+            "title": row.event_title,
+            "location": row.event_location,
+        },
+        "ticket": ticket_text,
+        "verified_at": row.scanned_at.isoformat()
+    }
 
-        qr_codes.append({
-            "id": new_qrcode.id,
-            "ticket_no": ticket_no,
-            "participant_id": participant.id,
-            "event_id": event.id,
-            "user_id": user.id,
-            "qr_data": qr_base64
-        })
 
-    return qr_codes
+# ------------------ Verify signed ticket (fast path) ------------------
+async def verify_ticket_token(db: AsyncSession, qr_text: str):
+    """
+    Forged or malformed codes are rejected from the HMAC alone, without a
+    database round trip. Genuine ones cost a single conditional UPDATE
+    keyed by the qrcodes primary key.
+    """
+    token = read_ticket_token(qr_text)
+    if not token:
+        return {"status": "invalid", "message": "Invalid ticket signature."}
+    event_id, ticket_id = token
 
+    return await check_in_ticket(db, and_(QRCode.id == ticket_id, QRCode.event_id == event_id), qr_text)
 
-async def verify_qr_code(db: Session, qr_text: str):
+
+async def verify_qr_code(db: AsyncSession, qr_text: str):
     try:
-        # Extract key:*value* pairs using regex
-        matches = re.findall(r"(\w+):\*(.*?)\*", qr_text)
-        qr_info = {k: v for k, v in matches}
+        if ":*" not in qr_text:
+            # Signed ticket token: "<event_id>.<ticket_id>.<signature>"
+            return await verify_ticket_token(db, qr_text)
+
+        # Legacy payload: extract key:*value* pairs using regex
+        # ename and ticket values end with a newline, hence DOTALL
+        matches = re.findall(r"(\w+):\*(.*?)\*", qr_text, re.DOTALL)
+        qr_info = {k: v.strip() for k, v in matches}
 
         required_keys = {"uid", "uname", "eid", "ename", "ticket", "uemail"}
         if not required_keys.issubset(qr_info.keys()):
             return {"status": "invalid", "message": "Malformed QR payload."}
 
-        # Validate user, event, and QR record
-        user = db.query(User).filter(User.id == int(qr_info["uid"])).first()
-        event = db.query(Event).filter(Event.id == int(qr_info["eid"])).first()
-        qr_record = db.query(QRCode).filter(
-            QRCode.user_id == int(qr_info["uid"]),
-            QRCode.event_id == int(qr_info["eid"]),
-            QRCode.user_email == qr_info["uemail"]
-        ).first()
-
-        if not user or not event or not qr_record:
-            return {"status": "invalid", "message": "User, event, or QR code not found."}
-
-        # Prevent reuse
-        if qr_record.verified == "verified":
-            return {"status": "reused", "message": "This ticket has already been used."}
-
-        # Mark as verified and set scanned_at
-        qr_record.verified = "verified"
-        qr_record.scanned_at = datetime.utcnow()
-        db.commit()
-
-        # Check event date
-        if event.event_date and isinstance(event.event_date, datetime):
-            if event.event_date < datetime.utcnow():
-                return {"status": "expired", "message": "Event date has passed."}
-
-        return {
-            "status": "valid",
-            "message": "QR verified successfully.",
-            "user": {"id": user.id, "name": user.name, "email": user.email},
-            "event": {
-                "id": event.id,
-                "title": event.event_title,
-                "location": event.event_location,
-            },
-            "ticket": qr_info["ticket"],
-            "verified_at": qr_record.scanned_at.isoformat()
-        }
+        # "ticket" is "<participant_id>.<n>": the n-th ticket of that booking
+        participant_id, ticket_no = (int(part) for part in qr_info["ticket"].split("."))
+        nth_ticket = (
+            select(QRCode.id)
+            .where(QRCode.participant_id == participant_id)
+            .order_by(QRCode.id)
+            .offset(ticket_no - 1)
+            .limit(1)
+            .scalar_subquery()
+        )
+        return await check_in_ticket(
+            db,
+            and_(
+                QRCode.id == nth_ticket,
+                QRCode.user_id == int(qr_info["uid"]),
+                QRCode.event_id == int(qr_info["eid"]),
+                QRCode.user_email == qr_info["uemail"],
+            ),
+            qr_info["ticket"]
+        )
 
     except Exception as e:
-        return {"status": "error", "message": str(e)}
\ No newline at end of file
+        return {"status": "error", "message": str(e)}
+
+
+# ------------------ Offline scanners: manifest download ------------------
+async def get_ticket_manifest(db: AsyncSession, event_id: int, since: datetime = None):
+    """
+    Everything a gate device needs to admit people without a connection.
+    Each ticket is [ticket_id, digest, checked_in]; a scanned token
+    "<event_id>.<ticket_id>.<signature>" is valid offline when the
+    SHA-256 (base64url) of the scanned text equals the digest of its
+    ticket. Digests are one-way, so the manifest holds nothing that
+    works as a ticket. With `since` (the cursor of the previous
+    download) only tickets issued or checked in since are returned, by
+    server write time, so offline scans uploaded late are included
+    however long ago they were scanned.
+    """
+    event = await db.scalar(select(Event.id).where(Event.id == event_id))
+    if not event:
+        return None
+
+    cursor = datetime.utcnow()
+    query = select(QRCode.id, QRCode.verified).where(QRCode.event_id == event_id)
+    if since:
+        # Re-read a short overlap so rows committed late are not skipped
+        since = since - timedelta(seconds=checkin_sync_overlap)
+        query = query.where(QRCode.updated_at >= since)
+    rows = (await db.execute(query.order_by(QRCode.id))).all()
+
+    return {
+        "event_id": event_id,
+        "cursor": cursor.isoformat(),
+        "full": since is None,
+        "tickets": [
+            [row.id, ticket_digest(sign_ticket(event_id, row.id)), 1 if row.verified == "verified" else 0]
+            for row in rows
+        ],
+    }
+
+
+# ------------------ Offline scanners: batched check-in upload ------------------
+async def apply_offline_scans(db: AsyncSession, event_id: int, scans: list):
+    """
+    Applies a device's offline scans in one transaction. Within the batch
+    the earliest scan of a ticket counts. A ticket already checked in by
+    another device or an online gate is reported back as a conflict with
+    the check-in time recorded on the server.
+    """
+    rejected = []
+    first_scan = {}
+    for scan in scans:
+        token = read_ticket_token(scan.ticket)
+        if not token or token[0] != event_id:
+            rejected.append({"ticket": scan.ticket, "reason": "invalid"})
+            continue
+        ticket_id = token[1]
+        scanned_at = scan.scanned_at
+        if scanned_at.tzinfo:
+            scanned_at = scanned_at.astimezone(timezone.utc).replace(tzinfo=None)
+        if ticket_id not in first_scan or scanned_at < first_scan[ticket_id][1]:
+            first_scan[ticket_id] = (scan.ticket, scanned_at)
+    # Later scans of a ticket already present in this batch
+    duplicates = len(scans) - len(rejected) - len(first_scan)
+
+    accepted = []
+    if first_scan:
+        batch = values(
+            column("id", Integer), column("scanned_at", DateTime), name="scans"
+        ).data([(ticket_id, scanned_at) for ticket_id, (_, scanned_at) in first_scan.items()])
+        accepted = (
+            await db.scalars(
+                update(QRCode)
+                .where(
+                    QRCode.id == batch.c.id,
+                    QRCode.event_id == event_id,
+                    QRCode.verified.is_distinct_from("verified")
+                )
+                .values(verified="verified", scanned_at=batch.c.scanned_at)
+                .returning(QRCode.id)
+                .execution_options(synchronize_session=False)
+            )
+        ).all()
+
+    conflicts = []
+    missed = [t for t in first_scan if t not in set(accepted)]
+    if missed:
+        recorded = dict(
+            (await db.execute(
+                select(QRCode.id, QRCode.scanned_at).where(QRCode.id.in_(missed), QRCode.event_id == event_id)
+            )).all()
+        )
+        for ticket_id in missed:
+            if ticket_id in recorded:
+                conflicts.append({"ticket": first_scan[ticket_id][0], "checked_in_at": recorded[ticket_id]})
+            else:
+                rejected.append({"ticket": first_scan[ticket_id][0], "reason": "not_found"})
+    await db.commit()
+
+    return {
+        "event_id": event_id,
+        "accepted": len(accepted),
+        "duplicates": duplicates,
+        "conflicts": conflicts,
+        "rejected": rejected,
+    }
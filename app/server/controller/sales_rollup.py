@@ -0,0 +1,58 @@
+from collections import defaultdict
+from typing import List
+from sqlalchemy import select, update, values, column, Integer, Float, Date
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from server.models.event_model import Event
+from server.models.participant_model import Participant
+from server.models.sales_daily_model import SalesDaily
+
+
+# ------------------ Add bookings to the daily sales rollup ------------------
+async def add_daily_sales(db: AsyncSession, participants: List[Participant]):
+    """
+    Adds new bookings to sales_daily in the caller's transaction, so the
+    rollup changes exactly when the bookings do. A batch is summed per
+    event and day first and written with one upsert. Bookings without a
+    payment date are left out, as the sales reports always did.
+    """
+    totals = defaultdict(lambda: [0.0, 0])
+    for participant in participants:
+        if participant.payment_date is None:
+            continue
+        total = totals[(participant.event_id, participant.payment_date.date())]
+        total[0] += participant.payment or 0.0
+        total[1] += participant.total_booked or 0
+    if not totals:
+        return
+
+    # Sorted, so concurrent batches lock the rows in the same order
+    batch = values(
+        column("event_id", Integer), column("day", Date), column("revenue", Float), column("tickets", Integer),
+        name="sales"
+    ).data([(event_id, day, revenue, tickets) for (event_id, day), (revenue, tickets) in sorted(totals.items())])
+
+    stmt = insert(SalesDaily).from_select(
+        ["event_id", "day", "category", "host_id", "revenue", "tickets"],
+        select(batch.c.event_id, batch.c.day, Event.event_category, Event.host_id, batch.c.revenue, batch.c.tickets)
+        .join(Event, Event.id == batch.c.event_id)
+    )
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[SalesDaily.event_id, SalesDaily.day],
+            set_={
+                "revenue": SalesDaily.revenue + stmt.excluded.revenue,
+                "tickets": SalesDaily.tickets + stmt.excluded.tickets,
+            }
+        )
+    )
+
+
+# ------------------ Keep the copied category in step with the event ------------------
+async def move_daily_sales_category(db: AsyncSession, event_id: int, category: str):
+    await db.execute(
+        update(SalesDaily)
+        .where(SalesDaily.event_id == event_id)
+        .values(category=category)
+        .execution_options(synchronize_session=False)
+    )
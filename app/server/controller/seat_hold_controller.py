@@ -0,0 +1,199 @@
+import asyncio
+from typing import Any, Dict
+from datetime import datetime, timedelta
+from sqlalchemy import func, select, update, insert, literal
+from sqlalchemy.ext.asyncio import AsyncSession
+from server.database import new_session
+from server.controller.qrcode_event_controller import insert_tickets
+from server.controller.outbox import add_booking_events, add_outbox_event
+from server.controller.sales_rollup import add_daily_sales
+from server.models.event_model import Event
+from server.models.participant_model import Participant
+from server.models.seat_hold_model import SeatHold
+from server.constant_file import seat_hold_ttl_minutes, seat_hold_sweep_interval
+
+
+# ------------------ Place a seat hold ------------------
+async def create_seat_hold(db: AsyncSession, hold_data: Dict[str, Any]):
+    """
+    Takes the seats from events.filled_seat and records the hold in one
+    statement. Returns None when the event does not have enough seats left.
+    """
+    seats = int(hold_data.get("total_booked") or 1)
+    if seats < 1:
+        raise ValueError("At least one seat must be held")
+
+    now = datetime.utcnow()
+    filled = func.coalesce(Event.filled_seat, 0)
+    reserved = (
+        update(Event)
+        .where(
+            Event.id == hold_data["event_id"],
+            filled + seats <= Event.total_seat
+        )
+        .values(filled_seat=filled + seats)
+        .returning(Event.id)
+        .cte("reserved")
+    )
+
+    stmt = (
+        insert(SeatHold)
+        .from_select(
+            ["host_id", "event_id", "user_id", "seats", "status", "created_at", "expires_at"],
+            select(
+                literal(hold_data["host_id"], SeatHold.host_id.type),
+                reserved.c.id,
+                literal(hold_data["user_id"], SeatHold.user_id.type),
+                literal(seats, SeatHold.seats.type),
+                literal("held", SeatHold.status.type),
+                literal(now, SeatHold.created_at.type),
+                literal(now + timedelta(minutes=seat_hold_ttl_minutes), SeatHold.expires_at.type),
+            )
+        )
+        .returning(SeatHold)
+    )
+
+    hold = (await db.scalars(stmt)).first()
+    if not hold:
+        await db.rollback()
+        return None
+
+    add_outbox_event(db, "seats_changed", {"event_id": hold.event_id})
+    await db.commit()
+    return hold
+
+
+# ------------------ Confirm a seat hold ------------------
+async def confirm_seat_hold(db: AsyncSession, hold_id: int):
+    """
+    Turns a live hold into a participant. The seats were already counted
+    when the hold was placed, so events is not touched here. Returns None
+    when the hold is unknown, expired or already used.
+    """
+    payment_date = datetime.utcnow()
+
+    confirmed = (
+        update(SeatHold)
+        .where(
+            SeatHold.id == hold_id,
+            SeatHold.status == "held",
+            SeatHold.expires_at > payment_date
+        )
+        .values(status="confirmed")
+        .returning(SeatHold.id, SeatHold.host_id, SeatHold.event_id, SeatHold.user_id, SeatHold.seats)
+        .cte("confirmed")
+    )
+
+    stmt = (
+        insert(Participant)
+        .from_select(
+            ["host_id", "event_id", "user_id", "total_booked", "payment", "due", "payment_date", "payment_time"],
+            select(
+                confirmed.c.host_id,
+                confirmed.c.event_id,
+                confirmed.c.user_id,
+                confirmed.c.seats,
+                Event.event_price * confirmed.c.seats,
+                literal(0.0, Participant.due.type),
+                literal(payment_date, Participant.payment_date.type),
+                literal(payment_date.strftime("%H:%M:%S"), Participant.payment_time.type),
+            )
+            .join(Event, Event.id == confirmed.c.event_id)
+        )
+        .returning(Participant)
+    )
+
+    new_participant = (await db.scalars(stmt)).first()
+    if not new_participant:
+        await db.rollback()
+        return None
+
+    await db.execute(
+        update(SeatHold)
+        .where(SeatHold.id == hold_id)
+        .values(participant_id=new_participant.id)
+    )
+    # Tickets, the sales rollup and the change event are written in the same transaction as the booking
+    await insert_tickets(db, [new_participant])
+    await add_daily_sales(db, [new_participant])
+    add_booking_events(db, [new_participant])
+    await db.commit()
+    return new_participant
+
+
+# ------------------ Release a seat hold ------------------
+async def release_seat_hold(db: AsyncSession, hold_id: int):
+    released = (
+        update(SeatHold)
+        .where(SeatHold.id == hold_id, SeatHold.status == "held")
+        .values(status="released")
+        .returning(SeatHold.event_id, SeatHold.seats)
+        .cte("released")
+    )
+    stmt = (
+        update(Event)
+        .where(Event.id == released.c.event_id)
+        .values(filled_seat=func.greatest(func.coalesce(Event.filled_seat, 0) - released.c.seats, 0))
+        .returning(Event.id)
+        .execution_options(synchronize_session=False)
+    )
+
+    event_id = await db.scalar(stmt)
+    if event_id:
+        add_outbox_event(db, "seats_changed", {"event_id": event_id})
+    await db.commit()
+    if not event_id:
+        return None
+    return {"hold_id": hold_id, "event_id": event_id, "status": "released"}
+
+
+# ------------------ Return expired holds to their events ------------------
+async def release_expired_seat_holds(db: AsyncSession):
+    """
+    Expires every overdue hold and gives its seats back in one statement.
+    SKIP LOCKED lets several workers sweep at the same time without
+    blocking each other or a hold that is being confirmed.
+    """
+    overdue = (
+        select(SeatHold.id)
+        .where(SeatHold.status == "held", SeatHold.expires_at <= datetime.utcnow())
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    expired = (
+        update(SeatHold)
+        .where(SeatHold.id.in_(overdue))
+        .values(status="expired")
+        .returning(SeatHold.event_id, SeatHold.seats)
+        .cte("expired")
+    )
+    per_event = (
+        select(expired.c.event_id, func.sum(expired.c.seats).label("seats"))
+        .group_by(expired.c.event_id)
+        .cte("per_event")
+    )
+    stmt = (
+        update(Event)
+        .where(Event.id == per_event.c.event_id)
+        .values(filled_seat=func.greatest(func.coalesce(Event.filled_seat, 0) - per_event.c.seats, 0))
+        .returning(Event.id)
+        .execution_options(synchronize_session=False)
+    )
+
+    released_events = (await db.scalars(stmt)).all()
+    for event_id in released_events:
+        add_outbox_event(db, "seats_changed", {"event_id": event_id})
+    await db.commit()
+    return released_events
+
+
+async def run_seat_hold_sweeper():
+    while True:
+        db = new_session()
+        try:
+            await release_expired_seat_holds(db)
+        except Exception as e:
+            print(f"Seat hold sweep failed: {e}")
+        finally:
+            await db.close()
+        await asyncio.sleep(seat_hold_sweep_interval)
@@ -0,0 +1,144 @@
+import asyncio
+import json
+from typing import Any, Dict, List, Set
+from sqlalchemy import select
+from server.database import new_session
+from server.models.event_model import Event
+from server.controller.outbox import outbox_handler
+from server.controller.ws_broker import ws_broker
+from server.constant_file import seat_stream_max_rate, seat_stream_heartbeat
+
+
+def _seat_state(event) -> str:
+    return json.dumps({
+        "event_id": event.id,
+        "total_seat": event.total_seat,
+        "filled_seat": event.filled_seat,
+    })
+
+
+class SeatCounterStream:
+    """
+    Live seat counters for public event pages, as Server-Sent Events.
+
+    Booking and seat-hold changes reach `changed` through the outbox
+    relay. Changes are coalesced there: at most `max_rate` times a second
+    the counters of every changed event are read in one query and
+    published through the WebSocket broker, so the viewers of every
+    worker get them. A viewer is a one-slot queue that only ever holds the
+    newest state, so an idle or slow page costs one small object.
+    """
+
+    name = "seats"
+
+    def __init__(self, max_rate: float = seat_stream_max_rate, broker=ws_broker):
+        self.interval = 1 / max_rate
+        self.broker = broker
+        self.viewers: Dict[int, Set[asyncio.Queue]] = {}
+        self.latest: Dict[int, str] = {}
+        self.dirty: Set[int] = set()
+        self._publisher = None
+        broker.register(self)
+
+    # ------------------ Publishing side (the outbox relay's worker) ------------------
+    def changed(self, event_id: int):
+        self.dirty.add(event_id)
+        if self._publisher is None or self._publisher.done():
+            self._publisher = asyncio.create_task(self._run_publisher())
+
+    async def _run_publisher(self):
+        while self.dirty:
+            # Waiting first folds a burst of bookings into one update
+            await asyncio.sleep(self.interval)
+            event_ids, self.dirty = self.dirty, set()
+            db = new_session()
+            try:
+                events = (
+                    await db.execute(
+                        select(Event.id, Event.total_seat, Event.filled_seat).where(Event.id.in_(event_ids))
+                    )
+                ).all()
+                await db.commit()
+            except Exception as e:
+                print(f"Seat counter read failed: {e}")
+                continue
+            finally:
+                await db.close()
+            for event in events:
+                await self.broker.publish(self.name, _seat_state(event), [str(event.id)])
+
+    # ------------------ Viewer side (every worker) ------------------
+    def deliver(self, text: str, topics: List[str] = None):
+        event_id = int(topics[0])
+        viewers = self.viewers.get(event_id)
+        if not viewers:
+            return
+        self.latest[event_id] = text
+        for queue in viewers:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(text)
+
+    async def _initial_state(self, event_id: int):
+        if event_id in self.latest:
+            return self.latest[event_id]
+        db = new_session()
+        try:
+            event = (
+                await db.execute(
+                    select(Event.id, Event.total_seat, Event.filled_seat).where(Event.id == event_id)
+                )
+            ).first()
+            await db.commit()
+        finally:
+            await db.close()
+        if not event:
+            return None
+        self.latest[event_id] = _seat_state(event)
+        return self.latest[event_id]
+
+    async def open(self, event_id: int):
+        """The SSE body for one viewer, or None if the event doesn't exist."""
+        # Watching before reading, so an update can't slip in between
+        queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+        self.viewers.setdefault(event_id, set()).add(queue)
+        try:
+            state = await self._initial_state(event_id)
+        except Exception:
+            self._unwatch(event_id, queue)
+            raise
+        if state is None:
+            self._unwatch(event_id, queue)
+            return None
+        return self._stream(event_id, queue, state)
+
+    def _unwatch(self, event_id: int, queue: asyncio.Queue):
+        viewers = self.viewers.get(event_id)
+        if viewers is not None:
+            viewers.discard(queue)
+            if not viewers:
+                del self.viewers[event_id]
+                self.latest.pop(event_id, None)
+
+    async def _stream(self, event_id: int, queue: asyncio.Queue, state: str):
+        try:
+            yield f"event: seats\ndata: {state}\n\n"
+            while True:
+                try:
+                    state = await asyncio.wait_for(queue.get(), seat_stream_heartbeat)
+                except asyncio.TimeoutError:
+                    # Keeps proxies from closing an idle connection
+                    yield ": ping\n\n"
+                    continue
+                yield f"event: seats\ndata: {state}\n\n"
+        finally:
+            self._unwatch(event_id, queue)
+
+
+seat_stream = SeatCounterStream()
+
+
+@outbox_handler("participant_added")
+@outbox_handler("seats_changed")
+async def count_seats(payload: Dict[str, Any]):
+    seat_stream.changed(payload["event_id"])
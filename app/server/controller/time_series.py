@@ -0,0 +1,70 @@
+from datetime import date, datetime, time
+from typing import Any, Dict
+from sqlalchemy import select, func, cast, literal, literal_column, DateTime
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# granularity -> (date_trunc unit, step, label format)
+GRANULARITIES = {
+    "day": ("'day'", "interval '1 day'", "YYYY-MM-DD"),
+    "week": ("'week'", "interval '1 week'", "YYYY-MM-DD"),  # labelled by the Monday
+    "month": ("'month'", "interval '1 month'", "YYYY-MM"),
+}
+
+
+# ------------------ Gap-filled time series ------------------
+async def time_series(db: AsyncSession, time_column, series: Dict[str, Any], *criteria,
+                      start: date = None, end: date = None, granularity: str = "day", columns: bool = False):
+    """
+    Sums `series` (output key -> aggregate, e.g. func.sum(SalesDaily.revenue))
+    per day, week or month of the date column `time_column` over the rows matching
+    `criteria`, with every period between start and end present and empty
+    ones at 0. Without start/end the range runs from the first to the last
+    period that has rows; with neither rows nor bounds the result is empty.
+
+    Gaps are filled by generate_series in the same query, and periods are
+    labelled there too, so long ranges cost no Python work beyond reading
+    the rows. Returns [{"date": ..., key: ...}, ...], or with `columns`
+    {"date": [...], key: [...]}.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+    if start and end and start > end:
+        raise ValueError("start must not be after end")
+    unit, step, label = GRANULARITIES[granularity]
+
+    # A single truncation expression, so asyncpg binds the unit once (see get_monthly_total_sale)
+    period = func.date_trunc(literal_column(unit), cast(time_column, DateTime))
+    if start:
+        criteria += (time_column >= start,)
+    if end:
+        criteria += (time_column <= end,)
+    data = (
+        select(period.label("period"), *[total.label(key) for key, total in series.items()])
+        .where(*criteria)
+        .group_by(period)
+        .cte("data")
+    )
+
+    def bound(day: date):
+        return func.date_trunc(literal_column(unit), literal(datetime.combine(day, time.min), DateTime))
+
+    first = bound(start) if start else select(func.min(data.c.period)).scalar_subquery()
+    last = bound(end) if end else select(func.max(data.c.period)).scalar_subquery()
+    periods = func.generate_series(first, last, literal_column(step)).table_valued("period").render_derived(name="periods")
+
+    rows = (
+        await db.execute(
+            select(
+                func.to_char(periods.c.period, label).label("date"),
+                *[func.coalesce(data.c[key], 0).label(key) for key in series]
+            )
+            .select_from(periods)
+            .outerjoin(data, data.c.period == periods.c.period)
+            .order_by(periods.c.period)
+        )
+    ).all()
+
+    keys = ["date", *series]
+    if columns:
+        return dict(zip(keys, map(list, zip(*rows)))) if rows else {key: [] for key in keys}
+    return [dict(zip(keys, row)) for row in rows]
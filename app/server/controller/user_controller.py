@@ -1,9 +1,11 @@
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 import smtplib
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from server.models.user_model import * 
-from server.controller.ws_manager import user_manager
+from server.controller.ws_manager import user_manager, ADMIN_TOPIC
+from server.controller.outbox import add_outbox_event, outbox_handler
 from server.cryptography import *
 from server.constant_file import (eventisa_email,
                                   password_reset_subject,
@@ -18,94 +20,94 @@ import os
 import asyncio
 
 # ------------------ Add New User ------------------
-async def add_user(db: Session, user_data: dict):
+async def add_user(db: AsyncSession, user_data: dict):
     new_user = User(**user_data)
     new_user.password=encrypt_password(new_user.password)
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
-
-    # Broadcast new user
-    await user_manager.broadcast({
-        "event": "new_user",
-        "data": {
-            "id": new_user.id,
-            "name": new_user.name,
-            "email": new_user.email,
-            "phone_number":new_user.phone_number,
-            "image_url": new_user.image_url,
-        }
+    await db.flush()
+    add_outbox_event(db, "user_added", {
+        "id": new_user.id,
+        "name": new_user.name,
+        "email": new_user.email,
+        "phone_number":new_user.phone_number,
+        "image_url": new_user.image_url,
     })
+    await db.commit()
+    await db.refresh(new_user)
     return new_user.__dict__
 
-async def retrieve_users(db: Session):
-    return db.query(User).all()
+@outbox_handler("user_added")
+async def announce_user(payload: dict):
+    await user_manager.broadcast({"event": "new_user", "data": payload}, topics=[ADMIN_TOPIC])
 
+async def retrieve_users(db: AsyncSession):
+    return (await db.scalars(select(User))).all()
 
 
-async def retrieve_user_by_email(db: Session, email: str):
-    return db.query(User).filter(User.email == email).first()
 
+async def retrieve_user_by_email(db: AsyncSession, email: str):
+    return await db.scalar(select(User).where(User.email == email))
 
 
-async def retrieve_user(db: Session, field: str, value: str):
+
+async def retrieve_user(db: AsyncSession, field: str, value: str):
     if field == "id":
-        return db.query(User).filter(User.id == value).first()
+        return await db.scalar(select(User).where(User.id == value))
     elif field == "email":
-        return db.query(User).filter(User.email == value).first()
+        return await db.scalar(select(User).where(User.email == value))
     elif field == "name":
-        return db.query(User).filter(User.name == value).first()
+        return await db.scalar(select(User).where(User.name == value))
     elif field =="phone_number":
-        return db.query(User).filter(User.phone_number==value).first()
+        return await db.scalar(select(User).where(User.phone_number==value))
     return None
 
-async def retrieve_searched_users(db: Session, field: str, value: str):
+async def retrieve_searched_users(db: AsyncSession, field: str, value: str):
     if field == "name":
-        return db.query(User).filter(User.name == value).all()
+        return (await db.scalars(select(User).where(User.name == value))).all()
     if field == "phone_number":
-        return db.query(User).filter(User.phone_number == value).all()
+        return (await db.scalars(select(User).where(User.phone_number == value))).all()
     if field == "email":
-        return db.query(User).filter(User.email == value).all()
+        return (await db.scalars(select(User).where(User.email == value))).all()
 
 
 
-async def update_user(db: Session, user_id: int, update_data: dict):
-    user = db.query(User).filter(User.id == user_id).first()
+async def update_user(db: AsyncSession, user_id: int, update_data: dict):
+    user = await db.scalar(select(User).where(User.id == user_id))
     if not user:
         return None
     if user.email!=update_data["email"]:
         return "Invalid to change email"
     for key, val in update_data.items():
         setattr(user, key, val)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     return user.__dict__
 
-async def delete_user(db: Session, email: str):
-    user = db.query(User).filter(User.email == email).first()
+async def delete_user(db: AsyncSession, email: str):
+    user = await db.scalar(select(User).where(User.email == email))
     if not user:
         return None
     
-    db.delete(user)
-    db.commit()
+    await db.delete(user)
+    await db.commit()
     return user.__dict__
 
 
 
 
-async def initiate_password_reset_otp(db: Session, email: str, owner_type="user"):
+async def initiate_password_reset_otp(db: AsyncSession, email: str, owner_type="user"):
 #------------------Generate or update OTP -------------------
-    owner = db.query(User).filter(User.email == email).first()
+    owner = await db.scalar(select(User).where(User.email == email))
     if not owner:
         return False
 
     new_otp = generate_otp()
     expires_at = datetime.utcnow() + timedelta(minutes=5)
 
-    otp_record = db.query(OTPRecord).filter(
+    otp_record = await db.scalar(select(OTPRecord).where(
         OTPRecord.owner_id == owner.id,
         OTPRecord.owner_type == owner_type
-    ).first()
+    ))
 
     if otp_record:
         if otp_record.expires_at > datetime.utcnow():
@@ -113,7 +115,7 @@ async def initiate_password_reset_otp(db: Session, email: str, owner_type="user"
         else:
             otp_record.otp = new_otp
             otp_record.expires_at = expires_at
-            db.commit()
+            await db.commit()
             otp_to_send = new_otp
     else:
         otp_record = OTPRecord(
@@ -123,7 +125,7 @@ async def initiate_password_reset_otp(db: Session, email: str, owner_type="user"
             expires_at=expires_at
         )
         db.add(otp_record)
-        db.commit()
+        await db.commit()
         otp_to_send = new_otp
 
     email_sent = await send_email(owner.email, otp_to_send)
@@ -131,7 +133,7 @@ async def initiate_password_reset_otp(db: Session, email: str, owner_type="user"
         return {"message": f"OTP sent to {owner.email}"}
     return False
 
-async def password_reset_controller(db: Session, email: str, new_password: str=None):
+async def password_reset_controller(db: AsyncSession, email: str, new_password: str=None):
     
     try:
         #  Retrieve user
@@ -144,7 +146,7 @@ async def password_reset_controller(db: Session, email: str, new_password: str=N
 
         # Update password
         user.password = encrypt_password(new_password)
-        db.commit()
+        await db.commit()
 
         return ResponseModel({"email": email}, "Password reset successfully. You can now log in.")
 
@@ -152,16 +154,16 @@ async def password_reset_controller(db: Session, email: str, new_password: str=N
         return ErrorResponseModel("Unexpected server error", 500, str(e))
 
 #---------------Verify OTP for password reset--------------
-async def verify_reset_otp_controller(db: Session, email: str, otp: str, owner_type="user"):
+async def verify_reset_otp_controller(db: AsyncSession, email: str, otp: str, owner_type="user"):
     
-    owner = db.query(User).filter(User.email == email).first()
+    owner = await db.scalar(select(User).where(User.email == email))
     if not owner:
         return ErrorResponseModel("Owner not found", 404, f"No {owner_type} with this email.")
 
-    otp_record = db.query(OTPRecord).filter(
+    otp_record = await db.scalar(select(OTPRecord).where(
         OTPRecord.owner_id == owner.id,
         OTPRecord.owner_type == owner_type
-    ).first()
+    ))
 
     if not otp_record:
         return ErrorResponseModel("OTP not found", 404, "No OTP record found.")
@@ -170,18 +172,18 @@ async def verify_reset_otp_controller(db: Session, email: str, otp: str, owner_t
         return ErrorResponseModel("Invalid OTP", 400, "Incorrect OTP.")
 
     if otp_record.expires_at < datetime.utcnow():
-        db.delete(otp_record)
-        db.commit()
+        await db.delete(otp_record)
+        await db.commit()
         return ErrorResponseModel("Expired OTP", 400, "OTP has expired.")
 
     # OTP is valid — delete it and allow password reset
-    db.delete(otp_record)
-    db.commit()
+    await db.delete(otp_record)
+    await db.commit()
     return ResponseModel({"email": owner.email}, "OTP verified successfully. Proceed to reset password.")
 
 # -------------------- Login user -----------------
-async def user_login(db: Session, email: str, password: str):
-    user = db.query(User).filter(User.email == email).first()
+async def user_login(db: AsyncSession, email: str, password: str):
+    user = await db.scalar(select(User).where(User.email == email))
     if not user:
         return {"status": "failed", "msg": "Email not found"}
     if not verify_password(password, user.password):
@@ -0,0 +1,230 @@
+import asyncio
+import itertools
+import json
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import psycopg2
+from server.database import DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, DB_NAME
+from server.constant_file import (ws_broker_backend,
+                                  ws_notify_channel,
+                                  ws_broker_reconnect_delay)
+
+# Postgres rejects NOTIFY payloads of 8000 bytes or more
+NOTIFY_PAYLOAD_LIMIT = 7999
+# Larger messages are sent as "#<message id>:<part>:<parts>:<piece>"; this leaves room for the header
+NOTIFY_CHUNK_SIZE = NOTIFY_PAYLOAD_LIMIT - 100
+# Partly received messages kept per worker; the oldest is dropped past this
+NOTIFY_PENDING_CHUNKED = 64
+
+
+class InProcessBroker:
+    """
+    Fans broadcasts out to the managers of this process only. Enough for a
+    single worker and for tests; the managers don't know which broker
+    they are registered with.
+    """
+
+    def __init__(self):
+        self.managers: Dict[str, "ConnectionManager"] = {}
+
+    def register(self, manager):
+        self.managers[manager.name] = manager
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def publish(self, name: str, text: str, topics: Optional[List[str]]):
+        self._deliver(name, text, topics)
+
+    def _deliver(self, name: str, text: str, topics: Optional[List[str]]):
+        manager = self.managers.get(name)
+        if manager:
+            manager.deliver(text, topics)
+
+
+class PostgresBroker(InProcessBroker):
+    """
+    Fans broadcasts out to every worker through Postgres LISTEN/NOTIFY.
+
+    A broadcast is delivered to this worker's clients straight away and
+    NOTIFYed on `channel` by a background sender; every other worker
+    LISTENs on its own connection, watched by the event loop, and delivers
+    what it receives to its clients. Messages carry the id of the worker
+    that sent them so it doesn't deliver them twice. Messages over the
+    NOTIFY limit go out in pieces and are put back together by the
+    receivers. If Postgres is unreachable broadcasts still reach this
+    worker's clients, and the listener reconnects on its own.
+    """
+
+    def __init__(self, channel: str = ws_notify_channel, reconnect_delay: float = ws_broker_reconnect_delay):
+        super().__init__()
+        self.channel = channel
+        self.reconnect_delay = reconnect_delay
+        self.origin = uuid.uuid4().hex
+        self._message_ids = itertools.count()
+        self._chunked: "OrderedDict[str, List[Optional[str]]]" = OrderedDict()
+        self._listener = None
+        self._publisher = None
+        self._outbox: asyncio.Queue = None
+        self._sender = None
+        self._reconnecting = None
+
+    def _connect(self):
+        conn = psycopg2.connect(host=DB_HOST, port=DB_PORT, user=DB_USER,
+                                password=DB_PASSWORD, dbname=DB_NAME)
+        conn.autocommit = True
+        return conn
+
+    # ------------------ Listening ------------------
+    async def start(self):
+        self._outbox = asyncio.Queue()
+        self._sender = asyncio.create_task(self._run_sender())
+        try:
+            await self._listen()
+        except Exception as e:
+            print(f"WebSocket broker could not listen on '{self.channel}', retrying: {e}")
+            self._schedule_reconnect()
+
+    async def _listen(self):
+        conn = await asyncio.to_thread(self._connect)
+        with conn.cursor() as cur:
+            cur.execute(f'LISTEN "{self.channel}"')
+        self._listener = conn
+        asyncio.get_running_loop().add_reader(conn.fileno(), self._on_notify)
+
+    def _on_notify(self):
+        conn = self._listener
+        try:
+            conn.poll()
+        except Exception as e:
+            print(f"WebSocket broker lost its listener connection: {e}")
+            self._drop_listener()
+            self._schedule_reconnect()
+            return
+        while conn.notifies:
+            payload = conn.notifies.pop(0).payload
+            if payload.startswith("#"):
+                payload = self._add_chunk(payload)
+                if payload is None:
+                    continue
+            try:
+                message = json.loads(payload)
+            except ValueError:
+                continue
+            if message.get("origin") != self.origin:
+                self._deliver(message["manager"], message["data"], message.get("topics"))
+
+    def _add_chunk(self, payload: str) -> Optional[str]:
+        """Buffers one piece of a chunked message; returns the message once complete."""
+        try:
+            message_id, part, parts, piece = payload[1:].split(":", 3)
+            part, parts = int(part), int(parts)
+        except ValueError:
+            return None
+        if message_id.startswith(self.origin):
+            return None  # ours, already delivered locally
+        pieces = self._chunked.get(message_id)
+        if pieces is None:
+            pieces = self._chunked[message_id] = [None] * parts
+            if len(self._chunked) > NOTIFY_PENDING_CHUNKED:
+                # A sender that died mid-message never completes it
+                self._chunked.popitem(last=False)
+        if not 0 <= part < len(pieces):
+            return None
+        pieces[part] = piece
+        if any(p is None for p in pieces):
+            return None
+        del self._chunked[message_id]
+        return "".join(pieces)
+
+    def _drop_listener(self):
+        conn, self._listener = self._listener, None
+        if conn is None:
+            return
+        try:
+            asyncio.get_running_loop().remove_reader(conn.fileno())
+        except Exception:
+            pass
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _schedule_reconnect(self):
+        if self._reconnecting is None or self._reconnecting.done():
+            self._reconnecting = asyncio.create_task(self._reconnect())
+
+    async def _reconnect(self):
+        while self._listener is None:
+            await asyncio.sleep(self.reconnect_delay)
+            try:
+                await self._listen()
+                print(f"WebSocket broker listening on '{self.channel}' again")
+            except Exception as e:
+                print(f"WebSocket broker reconnect failed: {e}")
+
+    # ------------------ Publishing ------------------
+    async def publish(self, name: str, text: str, topics: Optional[List[str]]):
+        self._deliver(name, text, topics)
+        if self._outbox is None:
+            return  # not started (scripts, tests): this process only
+        # ASCII-only (json escapes the rest), so characters are bytes
+        payload = json.dumps({"origin": self.origin, "manager": name, "topics": topics, "data": text})
+        if len(payload) <= NOTIFY_PAYLOAD_LIMIT:
+            self._outbox.put_nowait(payload)
+            return
+        # Queued back to back, so the sender NOTIFYs the pieces in order
+        message_id = f"{self.origin}-{next(self._message_ids)}"
+        pieces = [payload[i:i + NOTIFY_CHUNK_SIZE] for i in range(0, len(payload), NOTIFY_CHUNK_SIZE)]
+        for part, piece in enumerate(pieces):
+            self._outbox.put_nowait(f"#{message_id}:{part}:{len(pieces)}:{piece}")
+
+    def _notify(self, payloads: List[str]):
+        """Runs in a thread."""
+        if self._publisher is None or self._publisher.closed:
+            self._publisher = self._connect()
+        try:
+            with self._publisher.cursor() as cur:
+                for payload in payloads:
+                    cur.execute("SELECT pg_notify(%s, %s)", (self.channel, payload))
+        except Exception:
+            self._publisher.close()
+            raise
+
+    async def _run_sender(self):
+        while True:
+            payloads = [await self._outbox.get()]
+            # Whatever queued up meanwhile goes in the same round of NOTIFYs
+            while not self._outbox.empty():
+                payloads.append(self._outbox.get_nowait())
+            try:
+                await asyncio.to_thread(self._notify, payloads)
+            except Exception as e:
+                print(f"WebSocket broker could not publish {len(payloads)} messages: {e}")
+                await asyncio.sleep(self.reconnect_delay)
+
+    async def stop(self):
+        for task in (self._sender, self._reconnecting):
+            if task:
+                task.cancel()
+        self._drop_listener()
+        if self._publisher is not None:
+            self._publisher.close()
+            self._publisher = None
+        self._outbox = None
+        self._chunked.clear()
+
+
+def make_broker(backend: str = ws_broker_backend):
+    if backend == "postgres":
+        return PostgresBroker()
+    if backend == "memory":
+        return InProcessBroker()
+    raise ValueError(f"Unknown WebSocket broker backend '{backend}'")
+
+
+ws_broker = make_broker()
@@ -1,26 +1,216 @@
-from typing import List
-from fastapi import WebSocket
+import asyncio
+import json
+from typing import Dict, Iterable, List, Set
+from fastapi import WebSocket, WebSocketDisconnect
+from fastapi.encoders import jsonable_encoder
+from server.controller.ws_broker import ws_broker
+from server.constant_file import (admin_ws_key,
+                                  ws_send_queue_size,
+                                  ws_slow_consumer_policy,
+                                  ws_send_timeout)
+
+# A connection that never subscribes receives every broadcast, as before,
+# except those meant for admin subscribers only
+ALL_TOPICS = "*"
+ADMIN_TOPIC = "admin"
+
+
+def event_topic(event_id: int) -> str:
+    return f"event:{event_id}"
+
+
+def host_topic(host_id: int) -> str:
+    return f"host:{host_id}"
+
+
+def valid_topic(topic: str) -> bool:
+    kind, _, ident = topic.partition(":")
+    return topic == ADMIN_TOPIC or (kind in ("event", "host") and ident.isdigit())
+
+
+class Client:
+    """A connected socket, its bounded outgoing buffer and the task draining it."""
+
+    def __init__(self, websocket: WebSocket, queue_size: int):
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.writer = None
+        self.dropped = 0
+
 
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
+    """
+    Clients narrow what they receive by sending
+    {"action": "subscribe", "topic": "event:42"} (or "host:7", or "admin"
+    with the admin key). Broadcasts name their topics and reach only the
+    connections subscribed to one of them, plus connections that never
+    subscribed to anything unless the broadcast is for admin alone.
+
+    Broadcasting only queues the message: every client has its own writer
+    task, so a stalled client never holds up the others or the request
+    that triggered the broadcast. When a client's buffer is full the
+    oldest message is dropped (dashboards only need the latest state), or
+    the client is disconnected under the "disconnect" policy. A client
+    whose send fails or times out is removed.
+
+    Broadcasts go through the broker, which hands them to the manager of
+    the same name in every worker (see ws_broker).
+    """
+
+    def __init__(self, name: str, broker=ws_broker,
+                 queue_size: int = ws_send_queue_size,
+                 slow_consumer_policy: str = ws_slow_consumer_policy,
+                 send_timeout: float = ws_send_timeout):
+        self.name = name
+        self.broker = broker
+        self.queue_size = queue_size
+        self.slow_consumer_policy = slow_consumer_policy
+        self.send_timeout = send_timeout
+        self.clients: Dict[WebSocket, Client] = {}
+        self.subscribers: Dict[str, Set[WebSocket]] = {}
+        self.topics: Dict[WebSocket, Set[str]] = {}
+        broker.register(self)
+
+    @property
+    def active_connections(self) -> List[WebSocket]:
+        return list(self.clients)
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
-        self.active_connections.append(websocket)
+        client = Client(websocket, self.queue_size)
+        client.writer = asyncio.create_task(self._write(client))
+        self.clients[websocket] = client
+        self._add(websocket, ALL_TOPICS)
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+        client = self.clients.pop(websocket, None)
+        if client and client.writer is not asyncio.current_task():
+            client.writer.cancel()
+        for topic in self.topics.pop(websocket, set()):
+            self._discard(websocket, topic)
+
+    # ------------------ Sending ------------------
+    def _send(self, client: Client, text: str):
+        if client.queue.full():
+            if self.slow_consumer_policy == "disconnect":
+                self._reap(client, "send buffer full")
+                return
+            client.queue.get_nowait()
+            client.dropped += 1
+        client.queue.put_nowait(text)
+
+    async def _write(self, client: Client):
+        try:
+            while True:
+                text = await client.queue.get()
+                await asyncio.wait_for(client.websocket.send_text(text), self.send_timeout)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._reap(client, repr(e))
+
+    def _reap(self, client: Client, reason):
+        if client.websocket not in self.clients:
+            return
+        print(f"Dropping websocket client ({reason}) after skipping {client.dropped} messages")
+        self.disconnect(client.websocket)
+        asyncio.create_task(self._close(client.websocket))
+
+    async def _close(self, websocket: WebSocket):
+        try:
+            await asyncio.wait_for(websocket.close(code=1013), self.send_timeout)
+        except Exception:
+            pass
+
+    def _add(self, websocket: WebSocket, topic: str):
+        self.subscribers.setdefault(topic, set()).add(websocket)
+        self.topics.setdefault(websocket, set()).add(topic)
+
+    def _discard(self, websocket: WebSocket, topic: str):
+        subscribers = self.subscribers.get(topic)
+        if subscribers is not None:
+            subscribers.discard(websocket)
+            if not subscribers:
+                del self.subscribers[topic]
+
+    def subscribe(self, websocket: WebSocket, topic: str):
+        # The first explicit subscription replaces "everything"
+        if ALL_TOPICS in self.topics.get(websocket, ()):
+            self.topics[websocket].discard(ALL_TOPICS)
+            self._discard(websocket, ALL_TOPICS)
+        self._add(websocket, topic)
+
+    def unsubscribe(self, websocket: WebSocket, topic: str):
+        self.topics.get(websocket, set()).discard(topic)
+        self._discard(websocket, topic)
+
+    async def handle_message(self, websocket: WebSocket, text: str):
+        try:
+            message = json.loads(text)
+            action, topic = message.get("action"), str(message.get("topic", ""))
+        except (ValueError, AttributeError):
+            return
+        if action not in ("subscribe", "unsubscribe"):
+            return
+        if not valid_topic(topic):
+            self._reply(websocket, {"event": "error", "message": f"Unknown topic '{topic}'"})
+            return
+        if action == "subscribe" and topic == ADMIN_TOPIC:
+            if not admin_ws_key or message.get("key") != admin_ws_key:
+                self._reply(websocket, {"event": "error", "message": "Not allowed to subscribe to admin"})
+                return
+
+        if action == "subscribe":
+            self.subscribe(websocket, topic)
+        else:
+            self.unsubscribe(websocket, topic)
+        self._reply(websocket, {"event": f"{action}d", "topic": topic})
+
+    def _reply(self, websocket: WebSocket, message: dict):
+        # Through the client's queue, so replies stay in order with broadcasts
+        client = self.clients.get(websocket)
+        if client:
+            self._send(client, json.dumps(message))
+
+    async def serve(self, websocket: WebSocket):
+        """Accept a client and handle its subscribe/unsubscribe messages until it leaves."""
+        await self.connect(websocket)
+        try:
+            while True:
+                await self.handle_message(websocket, await websocket.receive_text())
+        except (WebSocketDisconnect, RuntimeError):
+            # RuntimeError: the socket was closed by _reap while we were receiving
+            pass
+        finally:
+            self.disconnect(websocket)
+
+    async def broadcast(self, message: dict, topics: Iterable[str] = None):
+        """Queue `message` for every matching client of every worker; returns without waiting for any send."""
+        # Payloads are model rows; dates and times aren't JSON as-is.
+        # Encoded once for all clients.
+        text = json.dumps(jsonable_encoder(message))
+        await self.broker.publish(self.name, text, None if topics is None else list(topics))
 
-    async def broadcast(self, message: dict):
-        for connection in self.active_connections:
-            await connection.send_json(message)
+    def deliver(self, text: str, topics: List[str] = None):
+        """Queue an encoded broadcast for this worker's matching clients."""
+        if topics is None:
+            targets = list(self.clients)
+        else:
+            # Admin-only broadcasts (user details) must not reach unauthenticated sockets
+            public = any(topic != ADMIN_TOPIC for topic in topics)
+            targets = set(self.subscribers.get(ALL_TOPICS, ())) if public else set()
+            for topic in topics:
+                targets |= self.subscribers.get(topic, set())
+        for websocket in targets:
+            client = self.clients.get(websocket)
+            if client:
+                self._send(client, text)
 
 # Separate managers for different types of updates
-event_manager = ConnectionManager()
-ticket_manager = ConnectionManager()
-admin_manager = ConnectionManager()
-host_manager = ConnectionManager()
-participant_manager = ConnectionManager()
-user_manager=ConnectionManager()
-qr_code_manager=ConnectionManager()
\ No newline at end of file
+event_manager = ConnectionManager("events")
+ticket_manager = ConnectionManager("tickets")
+admin_manager = ConnectionManager("admin")
+host_manager = ConnectionManager("hosts")
+participant_manager = ConnectionManager("participants")
+user_manager=ConnectionManager("users")
+qr_code_manager=ConnectionManager("qr_codes")
@@ -1,4 +1,7 @@
-from server.constant_file import secret_key
+import base64
+import hashlib
+import hmac
+from server.constant_file import secret_key, ticket_signing_key
 def encrypt_password(password:str):
     encrypted = "".join(chr(ord(char) ^ secret_key) for char in password)
     return encrypted
@@ -11,4 +14,36 @@ def verify_password(plain_password,hashed_password):
     except Exception as e:
         print(e)
         return False
-    
+
+
+# ------------------ Ticket tokens ------------------
+# "<event_id>.<ticket_id>.<signature>", signature = first 12 bytes of
+# HMAC-SHA256 over "<event_id>.<ticket_id>", base64url without padding.
+def ticket_signature(event_id:int, ticket_id:int):
+    digest = hmac.new(ticket_signing_key.encode(), f"{event_id}.{ticket_id}".encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest[:12]).decode().rstrip("=")
+
+def sign_ticket(event_id:int, ticket_id:int):
+    return f"{event_id}.{ticket_id}.{ticket_signature(event_id, ticket_id)}"
+
+def ticket_digest(token:str):
+    """
+    SHA-256 of a token, base64url. Offline lists carry this instead of the
+    signature: a device can recognise a scanned ticket by it, but it can't
+    be turned back into a ticket.
+    """
+    digest = hashlib.sha256(token.strip().encode()).digest()
+    return base64.urlsafe_b64encode(digest).decode().rstrip("=")
+
+def read_ticket_token(token:str):
+    """Returns (event_id, ticket_id) for a genuine token, None otherwise."""
+    parts = token.strip().split(".")
+    if len(parts) != 3 or not (parts[0] + parts[1]).isascii():
+        return None
+    try:
+        event_id, ticket_id = int(parts[0]), int(parts[1])
+    except ValueError:
+        return None
+    if not hmac.compare_digest(parts[2], ticket_signature(event_id, ticket_id)):
+        return None
+    return event_id, ticket_id
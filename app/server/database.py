@@ -1,6 +1,9 @@
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import functools
 import os
 
 # Load environment variables from .env
@@ -12,20 +15,127 @@ DB_HOST = os.getenv("DB_HOST")
 DB_PORT = os.getenv("DB_PORT", 5433)
 DB_NAME = os.getenv("DB_NAME")
 
+# "true" -> asyncpg backed AsyncSession, "false" -> psycopg2 Session run in worker threads
+DB_ASYNC = os.getenv("DB_ASYNC", "true").lower() in ("1", "true", "yes")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 20))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 30))
+
 print(DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, DB_NAME)
 
 
 DATABASE_URL = f"postgresql+psycopg2://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+ASYNC_DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
-# SQLAlchemy setup
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+# SQLAlchemy setup (sync engine is still used by create_all and the maintenance scripts)
+engine = create_engine(
+    DATABASE_URL,
+    pool_pre_ping=True,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+async_engine = None
+AsyncSessionLocal = None
+if DB_ASYNC:
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        pool_pre_ping=True,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+    )
+    AsyncSessionLocal = async_sessionmaker(
+        async_engine, autoflush=False, expire_on_commit=False
+    )
+
+
+class ThreadedSession:
+    """
+    Awaitable wrapper around a sync Session exposing the subset of the
+    AsyncSession API the controllers use. Every database round trip runs
+    in a worker thread so psycopg2 never blocks the event loop.
+
+    Sessions that have touched the database hold one of `_slots` until
+    closed, and the executor has a thread per slot, so a session that
+    owns a connection (or row lock) can always get a thread to finish.
+    """
+
+    _slots = None
+    _executor = ThreadPoolExecutor(
+        max_workers=DB_POOL_SIZE + DB_MAX_OVERFLOW, thread_name_prefix="db"
+    )
+
+    def __init__(self, session):
+        self.sync_session = session
+        self._has_slot = False
+
+    async def _run(self, fn, *args):
+        if not self._has_slot:
+            if ThreadedSession._slots is None:
+                ThreadedSession._slots = asyncio.Semaphore(DB_POOL_SIZE + DB_MAX_OVERFLOW)
+            await ThreadedSession._slots.acquire()
+            self._has_slot = True
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(fn, *args))
+
+    def add(self, instance):
+        self.sync_session.add(instance)
+
+    def add_all(self, instances):
+        self.sync_session.add_all(instances)
+
+    async def execute(self, statement, params=None):
+        return await self._run(self.sync_session.execute, statement, params)
+
+    async def scalar(self, statement, params=None):
+        return await self._run(self.sync_session.scalar, statement, params)
+
+    async def scalars(self, statement, params=None):
+        return await self._run(self.sync_session.scalars, statement, params)
+
+    async def get(self, entity, ident):
+        return await self._run(self.sync_session.get, entity, ident)
+
+    async def delete(self, instance):
+        await self._run(self.sync_session.delete, instance)
+
+    async def flush(self):
+        await self._run(self.sync_session.flush)
+
+    async def commit(self):
+        await self._run(self.sync_session.commit)
+
+    async def rollback(self):
+        await self._run(self.sync_session.rollback)
+
+    async def refresh(self, instance):
+        await self._run(self.sync_session.refresh, instance)
+
+    async def close(self):
+        if not self._has_slot:
+            self.sync_session.close()
+            return
+        try:
+            await self._run(self.sync_session.close)
+        finally:
+            self._has_slot = False
+            ThreadedSession._slots.release()
+
+
+def new_session():
+    """Open a session outside of a request (background tasks, workers)."""
+    if DB_ASYNC:
+        return AsyncSessionLocal()
+    return ThreadedSession(SessionLocal(expire_on_commit=False))
+
+
 # Dependency for FastAPI routes
-def get_db():
-    db = SessionLocal()
+async def get_db():
+    db = new_session()
     try:
         yield db
     finally:
-        db.close()
+        await db.close()
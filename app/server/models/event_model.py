@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Text, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, Text, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from server.database import Base
@@ -9,7 +9,7 @@ class Event(Base):
     id = Column(Integer, primary_key=True, index=True)
 
     
-    host_id = Column(Integer, ForeignKey("hosts.id", ondelete="CASCADE"), nullable=False)
+    host_id = Column(Integer, ForeignKey("hosts.id", ondelete="CASCADE"), nullable=False, index=True)
 
 
     event_title = Column(String, nullable=False)
@@ -21,10 +21,15 @@ class Event(Base):
     event_price = Column(Float, nullable=False)
     total_seat = Column(Integer, nullable=False)
     filled_seat = Column(Integer, default=0)
-    event_category=Column(String,nullable=False)
+    event_category=Column(String,nullable=False, index=True)
     approval_status = Column(String, default="pending", nullable=False)  # pending, approved, rejected
 
     # Relationships
     host = relationship("Host", back_populates="events")
     participants = relationship("Participant", back_populates="event", cascade="all, delete-orphan")
     qrcodes = relationship("QRCode", back_populates="event", cascade="all, delete-orphan")
+
+    __table_args__ = (
+        # Listings filter on status and page through (event_date, id)
+        Index("ix_events_approval_status_event_date", "approval_status", "event_date", "id"),
+    )
@@ -0,0 +1,12 @@
+from sqlalchemy import Column, BigInteger, String, DateTime, JSON
+from datetime import datetime
+from server.database import Base
+
+class OutboxEvent(Base):
+    __tablename__ = "outbox"
+
+    # Sequence order is relay order
+    id = Column(BigInteger, primary_key=True)
+    kind = Column(String(50), nullable=False)
+    payload = Column(JSON, nullable=False, default=dict)
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Float, DateTime, String, ForeignKey
+from sqlalchemy import Column, Integer, Float, DateTime, String, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from server.database import Base
@@ -9,9 +9,9 @@ class Participant(Base):
     __tablename__ = "participants"
 
     id = Column(Integer, primary_key=True, index=True)
-    host_id = Column(Integer, ForeignKey("hosts.id", ondelete="CASCADE"), nullable=False)
+    host_id = Column(Integer, ForeignKey("hosts.id", ondelete="CASCADE"), nullable=False, index=True)
     event_id = Column(Integer, ForeignKey("events.id", ondelete="CASCADE"), nullable=False)
-    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
 
     total_booked = Column(Integer, nullable=False, default=1)
     payment = Column(Float, nullable=False, default=0.0)
@@ -27,6 +27,11 @@ class Participant(Base):
     # QR Codes linked to this participant
     qrcodes = relationship("QRCode", back_populates="participant", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Per-event lookups and the per-event sales rollups (also serves event_id alone)
+        Index("ix_participants_event_id_payment_date", "event_id", "payment_date"),
+    )
+
 
 class ParticipantCreate(BaseModel):
     host_id: int
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from server.database import Base
@@ -8,9 +8,9 @@ class QRCode(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     host_id = Column(Integer, ForeignKey("hosts.id", ondelete="CASCADE"), nullable=False)
-    event_id = Column(Integer, ForeignKey("events.id", ondelete="CASCADE"), nullable=False)
-    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
-    participant_id = Column(Integer, ForeignKey("participants.id", ondelete="CASCADE"), nullable=False)
+    event_id = Column(Integer, ForeignKey("events.id", ondelete="CASCADE"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    participant_id = Column(Integer, ForeignKey("participants.id", ondelete="CASCADE"), nullable=False, index=True)
 
     user_email = Column(String, nullable=False)
     user_name = Column(String, nullable=False)
@@ -20,9 +20,16 @@ class QRCode(Base):
     status = Column(String, nullable=True)
     verified = Column(String, default="unverified")  
     scanned_at = Column(DateTime, nullable=True)
+    # Server time of the last write; offline scans keep the device's scanned_at,
+    # so manifest deltas and syncs follow this instead
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationships
     host = relationship("Host", back_populates="qrcodes")
     event = relationship("Event", back_populates="qrcodes")
     user = relationship("User", back_populates="qrcodes")
     participant = relationship("Participant", back_populates="qrcodes")
+
+    __table_args__ = (
+        Index("ix_qrcodes_event_id_updated_at", "event_id", "updated_at"),
+    )
@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, Float, Date, String, ForeignKey, Index
+from server.database import Base
+
+class SalesDaily(Base):
+    """Bookings per event and payment day, kept up to date by every booking"""
+    __tablename__ = "sales_daily"
+
+    event_id = Column(Integer, ForeignKey("events.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+
+    # Copied from the event so category and host reports need no join
+    category = Column(String, nullable=True)
+    host_id = Column(Integer, ForeignKey("hosts.id", ondelete="CASCADE"), nullable=False)
+
+    revenue = Column(Float, nullable=False, default=0.0)
+    tickets = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_sales_daily_category_day", "category", "day"),
+        Index("ix_sales_daily_host_id_day", "host_id", "day"),
+        Index("ix_sales_daily_day", "day"),
+    )
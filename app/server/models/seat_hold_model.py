@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from datetime import datetime
+from server.database import Base
+
+class SeatHold(Base):
+    __tablename__ = "seat_holds"
+
+    id = Column(Integer, primary_key=True, index=True)
+    host_id = Column(Integer, ForeignKey("hosts.id", ondelete="CASCADE"), nullable=False)
+    event_id = Column(Integer, ForeignKey("events.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+
+    seats = Column(Integer, nullable=False, default=1)
+    status = Column(String, nullable=False, default="held")  # held, confirmed, released, expired
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+    # Participant created when the hold is confirmed
+    participant_id = Column(Integer, ForeignKey("participants.id", ondelete="SET NULL"), nullable=True)
@@ -1,17 +1,23 @@
 from fastapi import (
     APIRouter, Request, Response, status,
-    Form, File, UploadFile, Depends, Body
+    Form, File, UploadFile, Depends, Body, WebSocket
 )
 import re, os, shutil
 from fastapi.encoders import jsonable_encoder
-from sqlalchemy.orm import Session
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from server.database import get_db
 from server.controller.event_controller import *
 from server.schema.event_schema import EventUpdate
 from server.controller.ws_manager import event_manager
+from server.controller.flash_sale_manager import flash_sale_manager
+from server.controller.seat_stream import seat_stream
 from server.response_model import ResponseModel, ErrorResponseModel
 from server.models.event_model import Event
 from datetime import datetime
+from typing import Optional
+from server.constant_file import event_page_size
 
 router = APIRouter()
 # Use absolute path for uploads directory
@@ -34,7 +40,7 @@ async def add_event_data(
     event_price: float = Form(...),
     total_seat: int = Form(...),
     event_category: str = Form(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     try:
         
@@ -74,6 +80,8 @@ async def add_event_data(
             "total_seat": total_seat,
             "event_category": event_category,
         })
+        # jsonable_encoder turns the date into an ISO string; asyncpg needs the datetime itself
+        event_data["event_date"] = parsed_event_date
 
 
         new_event = await add_event_controller(db, event_data)
@@ -86,21 +94,37 @@ async def add_event_data(
         return ErrorResponseModel("An unexpected error occurred during event creation", 500, str(e))
     
     
+# ----------------------- List Events (one page) -----------------------
+# The cursor of the next page goes in the X-Next-Cursor header (absent on
+# the last page), so `data` keeps being a plain list of events.
+async def list_events_page(response: Response, db: AsyncSession, message: str, period: str = None,
+                           approval_status: str = "approved", **filters):
+    try:
+        events, next_cursor = await retrieve_events_page(db, approval_status, period, **filters)
+    except ValueError as e:
+        response.status_code = status.HTTP_400_BAD_REQUEST
+        return ErrorResponseModel(str(e), 400, "Invalid listing parameters")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return ResponseModel(events, message)
+
 # ----------------------- GET ALL Events -----------------------
 @router.get("/all", response_description="Retrieve all events")
-async def get_events(response: Response, db: Session = Depends(get_db), approval_status: str = "approved"):
-    events = await retrieve_events_controller(db, approval_status)
-    return ResponseModel(events, "Events retrieved successfully")
+async def get_events(response: Response, db: AsyncSession = Depends(get_db), approval_status: str = "approved",
+                     category: Optional[str] = None, date_from: Optional[datetime] = None,
+                     date_to: Optional[datetime] = None, cursor: Optional[str] = None, limit: int = event_page_size):
+    return await list_events_page(response, db, "Events retrieved successfully", None, approval_status,
+                                  category=category, date_from=date_from, date_to=date_to, cursor=cursor, limit=limit)
 
 # ----------------------- GET Pending Events -----------------------
 @router.get("/pending", response_description="Retrieve pending events for approval")
-async def get_pending_events(response: Response, db: Session = Depends(get_db)):
+async def get_pending_events(response: Response, db: AsyncSession = Depends(get_db)):
     events = await retrieve_pending_events_controller(db)
     return ResponseModel(events, "Pending events retrieved successfully")
 
 # ----------------------- APPROVE Event -----------------------
 @router.put("/approve/{event_id}", response_description="Approve an event")
-async def approve_event(event_id: int, db: Session = Depends(get_db)):
+async def approve_event(event_id: int, db: AsyncSession = Depends(get_db)):
     approved_event = await approve_event_controller(db, event_id)
     if not approved_event:
         return ErrorResponseModel("Event not found", 404, "Event not found")
@@ -108,16 +132,33 @@ async def approve_event(event_id: int, db: Session = Depends(get_db)):
 
 # ----------------------- REJECT Event -----------------------
 @router.put("/reject/{event_id}", response_description="Reject an event")
-async def reject_event(event_id: int, db: Session = Depends(get_db)):
+async def reject_event(event_id: int, db: AsyncSession = Depends(get_db)):
     rejected_event = await reject_event_controller(db, event_id)
     if not rejected_event:
         return ErrorResponseModel("Event not found", 404, "Event not found")
     return ResponseModel(rejected_event, "Event rejected successfully")
 
 
+# ----------------------- Enable High Demand (flash sale) mode -----------------------
+@router.put("/high_demand/enable/{event_id}", response_description="Enable high demand booking for an event")
+async def enable_high_demand(event_id: int, db: AsyncSession = Depends(get_db)):
+    sale = await flash_sale_manager.enable(db, event_id)
+    if not sale:
+        return ErrorResponseModel("Event not found", 404, "Event not found")
+    return ResponseModel(sale, "High demand mode enabled")
+
+# ----------------------- Disable High Demand (flash sale) mode -----------------------
+@router.put("/high_demand/disable/{event_id}", response_description="Disable high demand booking for an event")
+async def disable_high_demand(event_id: int):
+    sale = flash_sale_manager.disable(event_id)
+    if not sale:
+        return ErrorResponseModel("Not found", 404, "High demand mode is not enabled for this event")
+    return ResponseModel(sale, "High demand mode disabled")
+
+
 # ----------------------- SEARCH Event -----------------------
 @router.get("/search/{value}")
-async def search_event(response: Response, value: str, db: Session = Depends(get_db)):
+async def search_event(response: Response, value: str, db: AsyncSession = Depends(get_db)):
     try:
         
         try:
@@ -148,7 +189,7 @@ async def search_event(response: Response, value: str, db: Session = Depends(get
 
 #------------------ Retrieve Multiple Events by Field ------------------
 @router.get("/search/filter/{value}", response_description="retrieved field wise events")
-async def get_multiple_events( value: str, db: Session = Depends(get_db)):
+async def get_multiple_events( value: str, db: AsyncSession = Depends(get_db)):
     events = await retrieve_multiple_event_controller(db, value)
     if not events:
         ErrorResponseModel("No event found",400,"No event found")
@@ -156,7 +197,7 @@ async def get_multiple_events( value: str, db: Session = Depends(get_db)):
 
 # ------------------ Update Event ------------------
 @router.put("/update/{event_id}",response_description="updated event successfully")
-async def update_event(event_id: int, update_data: EventUpdate, db: Session = Depends(get_db)):
+async def update_event(event_id: int, update_data: EventUpdate, db: AsyncSession = Depends(get_db)):
     updated_event = await update_event_controller(db, event_id, update_data.dict(exclude_unset=True))
     if not updated_event:
         raise ErrorResponseModel("Event not found",404,"Event not found")
@@ -167,7 +208,7 @@ async def update_event(event_id: int, update_data: EventUpdate, db: Session = De
 
 # ------------------ Delete Event ------------------
 @router.delete("/{event_id}", response_description="deleted event successfully")
-async def delete_event(event_id: int, db: Session = Depends(get_db)):
+async def delete_event(event_id: int, db: AsyncSession = Depends(get_db)):
     deleted_event = await delete_event_controller(db, event_id)
     if not deleted_event:
         raise ErrorResponseModel("Event not found",404,"Event not found or already deleted")
@@ -178,33 +219,27 @@ async def delete_event(event_id: int, db: Session = Depends(get_db)):
 
 # ------------------ Retrieve Upcoming Events ------------------
 @router.get("/upcoming/", response_description="current events retrieved")
-async def get_upcoming_events(db: Session = Depends(get_db)):
-
-    all_events = await retrieve_events_controller(db, approval_status="approved")
-    upcoming = [event for event in all_events if event.event_date.date() >= datetime.now().date()]
-    return ResponseModel(
-        data=upcoming,
-        message="Upcoming events retrieved successfully",
-    )
+async def get_upcoming_events(response: Response, db: AsyncSession = Depends(get_db),
+                              category: Optional[str] = None, date_from: Optional[datetime] = None,
+                              date_to: Optional[datetime] = None, cursor: Optional[str] = None, limit: int = event_page_size):
+    return await list_events_page(response, db, "Upcoming events retrieved successfully", "upcoming",
+                                  category=category, date_from=date_from, date_to=date_to, cursor=cursor, limit=limit)
 
 # ------------------ Retrieve Upcoming Events ------------------
 @router.get("/archive/", response_description="Archived events retrieved successfully")
-async def get_archived_events(db: Session = Depends(get_db)):
-
-    all_events = await retrieve_events_controller(db, approval_status="approved")
-    archived = [event for event in all_events if event.event_date.date() < datetime.now().date()]
-    return ResponseModel(
-        data=archived,
-        message="Archived events retrieved successfully",
-    )
+async def get_archived_events(response: Response, db: AsyncSession = Depends(get_db),
+                              category: Optional[str] = None, date_from: Optional[datetime] = None,
+                              date_to: Optional[datetime] = None, cursor: Optional[str] = None, limit: int = event_page_size):
+    return await list_events_page(response, db, "Archived events retrieved successfully", "archive",
+                                  category=category, date_from=date_from, date_to=date_to, cursor=cursor, limit=limit)
 
 
 
 # ------------------ Retrieve Events by Host ID ------------------
 @router.get("/host/{host_id}", response_description="Host event retrieved")
-async def get_events_by_host(host_id: int, db: Session = Depends(get_db)):
+async def get_events_by_host(host_id: int, db: AsyncSession = Depends(get_db)):
     # Query events directly by host_id
-    events = db.query(Event).filter(Event.host_id == host_id).all()
+    events = (await db.scalars(select(Event).where(Event.host_id == host_id))).all()
     if not events:
         return ErrorResponseModel("No event found", 404, "No events found for this host")
     return ResponseModel(
@@ -219,7 +254,7 @@ async def get_events_by_host(host_id: int, db: Session = Depends(get_db)):
 
 # ------------------ Retrieve Seat availability ------------------
 @router.get("/analysis/seat/{event_id}", response_description="Archived events retrieved successfully")
-async def get_events_seat_info(event_id:int,db: Session = Depends(get_db)):
+async def get_events_seat_info(event_id:int,db: AsyncSession = Depends(get_db)):
 
     event_seats=await retrieve_event_seat_availability(db,event_id)
 
@@ -228,9 +263,21 @@ async def get_events_seat_info(event_id:int,db: Session = Depends(get_db)):
         message="Retrieved event seats"
     )
 
+# ------------------ Live seat availability (server-sent events) ------------------
+@router.get("/analysis/seat/{event_id}/stream", response_description="Seat availability pushed as it changes")
+async def stream_events_seat_info(event_id: int):
+    stream = await seat_stream.open(event_id)
+    if stream is None:
+        return ErrorResponseModel("Event not found", 404, "No event with this id")
+    return StreamingResponse(
+        stream,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 # ------------------ Get target earning ------------------
 @router.get("/analysis/target_earning/{event_id}", response_description="Archived events retrieved successfully")
-async def get_target_earning_info(event_id:int,db: Session = Depends(get_db)):
+async def get_target_earning_info(event_id:int,db: AsyncSession = Depends(get_db)):
 
     event_target=await get_targeted_earning(db,event_id)
 
@@ -243,7 +290,7 @@ async def get_target_earning_info(event_id:int,db: Session = Depends(get_db)):
 
 # ------------------ Get Total sale ------------------
 @router.get("/analysis/total_sale/{event_id}", response_description="Archived events retrieved successfully")
-async def get_total_sale(event_id:int,db: Session = Depends(get_db)):
+async def get_total_sale(event_id:int,db: AsyncSession = Depends(get_db)):
 
     event_sale=await get_total_sale_info(db,event_id)
 
@@ -253,6 +300,29 @@ async def get_total_sale(event_id:int,db: Session = Depends(get_db)):
     )
 
 
-
-
-__all__ = ["router"]
\ No newline at end of file
+# ------------------ Event dashboard ------------------
+# `sections` is a comma separated subset of DASHBOARD_SECTIONS; all of them by default
+@router.get("/{event_id}/dashboard", response_description="Every analysis of an event in one response")
+async def get_event_dashboard_info(response: Response, event_id: int, sections: Optional[str] = None,
+                                   db: AsyncSession = Depends(get_db)):
+    try:
+        dashboard = await get_event_dashboard(
+            db, event_id, [s.strip() for s in sections.split(",") if s.strip()] if sections else None
+        )
+    except ValueError as e:
+        response.status_code = status.HTTP_400_BAD_REQUEST
+        return ErrorResponseModel(str(e), 400, "Invalid dashboard sections")
+    if dashboard is None:
+        response.status_code = status.HTTP_404_NOT_FOUND
+        return ErrorResponseModel("Event not found", 404, "No event with this id")
+    return ResponseModel(dashboard, "Event dashboard retrieved successfully")
+
+
+# ----------------------- WEBSOCKET -----------------------
+@router.websocket("/ws/events")
+async def websocket_events(websocket: WebSocket):
+    # Clients may send {"action": "subscribe", "topic": "event:<id>"} to filter updates
+    await event_manager.serve(websocket)
+
+
+__all__ = ["router"]
@@ -1,10 +1,10 @@
 from fastapi import (
     APIRouter, Request, Response, status,
-    Form, File, UploadFile, Depends, Body
+    Form, File, UploadFile, Depends, Body, WebSocket
 )
 import re, os, shutil
 from fastapi.encoders import jsonable_encoder
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from server.database import get_db
 from server.controller.host_controller import *
 from server.schema.host_schema import HostUpdate
@@ -33,7 +33,7 @@ async def add_host_data(
     upzilla_thana: str = Form(...),
     address: str = Form(...),
     file: UploadFile = File(None),
-    db:Session=Depends(get_db)
+    db:AsyncSession=Depends(get_db)
 ):
     try:
         if re.match(r"[^@]+@[^@]+\.[^@]+", name):
@@ -81,20 +81,20 @@ async def add_host_data(
 
 # ----------------------- verification of otp -----------------------
 @router.get("/verify/email/{email}/otp/{otp}", response_description="Verify OTP")
-async def get_host_verfied(response: Response,email:str,otp:str, db: Session = Depends(get_db)):
+async def get_host_verfied(response: Response,email:str,otp:str, db: AsyncSession = Depends(get_db)):
     hosts = await verification_of_host(db,email,otp)
     return ResponseModel(hosts, "Host email verified successfully")
 
 
 # ----------------------- Resending otp -----------------------
 @router.get("/resend/otp/{email}", response_description="Resent otp")
-async def resend_otp(response: Response,email:str, db: Session = Depends(get_db)):
+async def resend_otp(response: Response,email:str, db: AsyncSession = Depends(get_db)):
     hosts = await resedning_otp_for_verification(db,email)
     return ResponseModel(hosts, "OTP sent to your email")
 
 # ----------------------- GET Host Login Message-----------------------
 @router.get("/login/email/{email}/password/{password}", response_description="Retrieve all hosts")
-async def get_host_login_msg(response: Response,email:str,password:str, db: Session = Depends(get_db)):
+async def get_host_login_msg(response: Response,email:str,password:str, db: AsyncSession = Depends(get_db)):
     hosts = await host_login(db,email,password)
 
     if (hosts["status"]=="failed"):
@@ -105,7 +105,7 @@ async def get_host_login_msg(response: Response,email:str,password:str, db: Sess
 
 # ----------------------- GET ALL Host -----------------------
 @router.get("/all", response_description="Retrieve all hosts")
-async def get_hosts(response: Response, db: Session = Depends(get_db)):
+async def get_hosts(response: Response, db: AsyncSession = Depends(get_db)):
     hosts = await retrieve_hosts(db)
     return ResponseModel(hosts, "Users retrieved successfully")
 
@@ -113,7 +113,7 @@ async def get_hosts(response: Response, db: Session = Depends(get_db)):
 
 # ----------------------- SEARCH Hosts -----------------------
 @router.get("/search/{host_id}")
-async def search_host(response: Response, host_id: str, db: Session = Depends(get_db)):
+async def search_host(response: Response, host_id: str, db: AsyncSession = Depends(get_db)):
     try:
         host = None
         # Try to search by ID first
@@ -162,7 +162,7 @@ async def update_host_data(
     response: Response,
     email: str,
     update_data: HostUpdate = Body(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     try:
         existing_host = await retrieve_host(db,"email", email)
@@ -182,7 +182,7 @@ async def update_host_data(
 
 # ----------------------- DELETE USER -----------------------
 @router.delete("/delete/{email}")
-async def delete_user_data(response: Response, email: str, db: Session = Depends(get_db)):
+async def delete_user_data(response: Response, email: str, db: AsyncSession = Depends(get_db)):
     deleted_host = await delete_host(db, email)
     if deleted_host:
         return ResponseModel(f"Host with email: {email} removed", "Host deleted successfully")
@@ -197,7 +197,7 @@ async def update_password(
     host_id: int,
     current_password: str = Form(...),
     new_password: str = Form(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     try:
         host = await retrieve_host(db, "id", host_id)
@@ -217,7 +217,7 @@ async def update_password(
 
 # ----------------------- FORGOT PASSWORD (SEND OTP) -----------------------
 @router.post("/forgot_password/send_otp", response_description="Send OTP for password reset")
-async def forgot_password(response: Response, email: str = Form(...), db: Session = Depends(get_db)):
+async def forgot_password(response: Response, email: str = Form(...), db: AsyncSession = Depends(get_db)):
     try:
         if not re.match(r"^[\w\.-]+@[\w\.-]+\.\w+$", email):
             return ErrorResponseModel(f"Invalid email: {email}", 400, "Email format invalid")
@@ -233,7 +233,7 @@ async def forgot_password(response: Response, email: str = Form(...), db: Sessio
 
 # ----------------------- VERIFY OTP -----------------------
 @router.post("/forgot_password/verify_otp/", response_description="Verify OTP for password reset")
-async def verify_reset_otp(response: Response, email: str = Form(...), otp: str = Form(...), db: Session = Depends(get_db)):
+async def verify_reset_otp(response: Response, email: str = Form(...), otp: str = Form(...), db: AsyncSession = Depends(get_db)):
     try:
         print("got it ")
         result = await verify_reset_otp_controller(db, email, otp,"host")
@@ -250,21 +250,26 @@ async def password_reset_host(
     response: Response,
     email: str = Form(...),
     new_password: str = Form(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     result = await password_reset(db, email, new_password)
     response.status_code = result["code"] if "code" in result else status.HTTP_200_OK
     return result
 
+# ----------------------- Host portfolio -----------------------
+@router.get("/portfolio/{host_id}", response_description="Sales, tickets, fill and check-in rates of a host's events")
+async def get_host_portfolio_info(response: Response, host_id: int, db: AsyncSession = Depends(get_db)):
+    portfolio = await get_host_portfolio(db, host_id)
+    if portfolio is None:
+        response.status_code = status.HTTP_404_NOT_FOUND
+        return ErrorResponseModel("Host not found", 404, "No host with this id")
+    return ResponseModel(portfolio, "Host portfolio retrieved successfully")
+
 # ----------------------- WEBSOCKET -----------------------
 @router.websocket("/ws/hosts")
-async def websocket_users(websocket):
-    await host_manager.connect(websocket)
-    try:
-        while True:
-            await websocket.receive_text()
-    except:
-        host_manager.disconnect(websocket)
+async def websocket_users(websocket: WebSocket):
+    # Clients may send {"action": "subscribe", "topic": ...} to filter updates
+    await host_manager.serve(websocket)
 
 
 __all__ = ["router"]
\ No newline at end of file
@@ -1,19 +1,20 @@
 from fastapi import (
     APIRouter, Request, Response, status,
-    Form, File, UploadFile, Depends, Body
+    Form, File, UploadFile, Depends, Body, WebSocket
 )
 import re, os, shutil
 from fastapi.encoders import jsonable_encoder
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from server.database import get_db
 from server.models.participant_model import ParticipantCreate
 from server.controller.participent_controller import *
+from server.controller.seat_hold_controller import create_seat_hold, confirm_seat_hold, release_seat_hold
 from server.schema.participatn_schema import ParticipantUpdate
 from server.controller.ws_manager import participant_manager
 from server.response_model import ResponseModel, ErrorResponseModel
 from pydantic import BaseModel
 from typing import Optional
-from datetime import datetime
+from datetime import datetime, date
 
 
 router = APIRouter()
@@ -27,32 +28,72 @@ class GuestBooking(BaseModel):
     event_id: int
     total_booked: Optional[int] = 1
 
+# ----------------------- Seat Hold Schema -----------------------
+class SeatHoldCreate(BaseModel):
+    host_id: int
+    event_id: int
+    user_id: int
+    total_booked: Optional[int] = 1
+
 # ----------------------- Add Participant -----------------------
 @router.post("/add", response_description="Add Participant")
-async def add_participant(participant: ParticipantCreate, db: Session = Depends(get_db)):
+async def add_participant(participant: ParticipantCreate, db: AsyncSession = Depends(get_db)):
     participant_data = participant.dict()
     try:
         new_participant = await add_participant_controller(db, participant_data)
         return ResponseModel(new_participant.__dict__, "Participant added successfully")
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         return ErrorResponseModel(str(e), 500, "Failed to add participant")
 
 # ----------------------- Guest Booking (No Login Required) -----------------------
 @router.post("/guest-booking", response_description="Guest booking without login")
-async def guest_booking(booking: GuestBooking, db: Session = Depends(get_db)):
+async def guest_booking(booking: GuestBooking, db: AsyncSession = Depends(get_db)):
     try:
         booking_data = booking.dict()
         new_participant = await add_participant_guest_controller(db, booking_data)
         return ResponseModel(new_participant.__dict__, "Booking successful! An account has been created for you.")
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         return ErrorResponseModel(str(e), 500, f"Failed to process booking: {str(e)}")
     
 
+# ----------------------- Hold seats during checkout -----------------------
+@router.post("/hold", response_description="Hold seats while the user pays")
+async def hold_seats(hold: SeatHoldCreate, db: AsyncSession = Depends(get_db)):
+    try:
+        seat_hold = await create_seat_hold(db, hold.dict())
+        if not seat_hold:
+            return ErrorResponseModel("Sold out", 409, "Event not found or not enough seats available")
+        return ResponseModel(seat_hold.__dict__, "Seats held successfully")
+    except Exception as e:
+        await db.rollback()
+        return ErrorResponseModel(str(e), 500, "Failed to hold seats")
+
+# ----------------------- Confirm held seats -----------------------
+@router.put("/hold/confirm/{hold_id}", response_description="Confirm a seat hold")
+async def confirm_hold(hold_id: int, db: AsyncSession = Depends(get_db)):
+    try:
+        new_participant = await confirm_seat_hold(db, hold_id)
+        if not new_participant:
+            return ErrorResponseModel("Hold not available", 410, "Seat hold not found, expired or already used")
+        return ResponseModel(new_participant.__dict__, "Participant added successfully")
+    except Exception as e:
+        await db.rollback()
+        return ErrorResponseModel(str(e), 500, "Failed to confirm seat hold")
+
+# ----------------------- Release held seats -----------------------
+@router.put("/hold/release/{hold_id}", response_description="Release a seat hold")
+async def release_hold(hold_id: int, db: AsyncSession = Depends(get_db)):
+    released = await release_seat_hold(db, hold_id)
+    if not released:
+        return ErrorResponseModel("Hold not available", 404, "Seat hold not found or no longer held")
+    return ResponseModel(released, "Seat hold released")
+    
+
 # ----------------------- Get Participants -----------------------
 @router.get("/all", response_description="Get Participants")
-async def get_participants(response: Response, db: Session = Depends(get_db)):
+async def get_participants(response: Response, db: AsyncSession = Depends(get_db)):
     
     participants = await retrieve_all_participant_controller(db)
     return ResponseModel(participants, "Participant data retrieved successfully")
@@ -60,50 +101,70 @@ async def get_participants(response: Response, db: Session = Depends(get_db)):
 
 # ----------------------- Get Participant by field -----------------------
 @router.get("/get_participants/{field}/{value}", response_description="Get Participant")
-async def get_participants(response: Response,field:str, value:int, db: Session = Depends(get_db)):
+async def get_participants(response: Response,field:str, value:int, db: AsyncSession = Depends(get_db)):
     participants = await retrieve_participant_controller(db,field,value)
     return ResponseModel(participants, "Participant data retrieved successfully")
 
 
 #------------------------- analysis part-------------------
 
+#------------------------ daily reports --------
+# Every daily report takes start/end (dates, inclusive), granularity (day,
+# week or month) and columns (column-oriented arrays instead of one dict
+# per period); see time_series.
+async def daily_report(response: Response, report, message: str, *args, **period):
+    try:
+        data = await report(*args, **period)
+    except ValueError as e:
+        response.status_code = status.HTTP_400_BAD_REQUEST
+        return ErrorResponseModel(str(e), 400, "Invalid report period")
+    return ResponseModel(data, message)
+
 #------------------------ get daily sales for event --------
 
 @router.get("/analysis/daily_sale_event/{event_id}", response_description="Get Participant")
-async def get_daily_sales_for_event_info(response: Response,event_id:int, db: Session = Depends(get_db)):
-    sales_data_event=await get_daily_sales_for_event(db,event_id)
-    return ResponseModel(sales_data_event,"Daily event sale retrieved successfully")
+async def get_daily_sales_for_event_info(response: Response,event_id:int, db: AsyncSession = Depends(get_db),
+                                         start: Optional[date] = None, end: Optional[date] = None,
+                                         granularity: str = "day", columns: bool = False):
+    return await daily_report(response, get_daily_sales_for_event, "Daily event sale retrieved successfully",
+                              db, event_id, start=start, end=end, granularity=granularity, columns=columns)
 
 #------------------------ get daily sales for category --------
 
 @router.get("/analysis/daily_sale_category/{category}", response_description="Get Participant")
-async def get_daily_sales_category_wise_info(response: Response,category:str, db: Session = Depends(get_db)):
-    sales_data_category=await get_daily_sales_for_category(db,category)
-    return ResponseModel(sales_data_category,"Daily Category wise sale retrieved successfully")
+async def get_daily_sales_category_wise_info(response: Response,category:str, db: AsyncSession = Depends(get_db),
+                                             start: Optional[date] = None, end: Optional[date] = None,
+                                             granularity: str = "day", columns: bool = False):
+    return await daily_report(response, get_daily_sales_for_category, "Daily Category wise sale retrieved successfully",
+                              db, category, start=start, end=end, granularity=granularity, columns=columns)
 
 
 
 #------------------------ get daily total sales --------
 
 @router.get("/analysis/daily_sale_total", response_description="Get Participant")
-async def get_daily_total_sale_info(response: Response, db: Session = Depends(get_db)):
-    sales_data_total=await get_daily_total_sales(db)
-    return ResponseModel(sales_data_total,"Daily total sale retrieved successfully")
+async def get_daily_total_sale_info(response: Response, db: AsyncSession = Depends(get_db),
+                                    start: Optional[date] = None, end: Optional[date] = None,
+                                    granularity: str = "day", columns: bool = False):
+    return await daily_report(response, get_daily_total_sales, "Daily total sale retrieved successfully",
+                              db, start=start, end=end, granularity=granularity, columns=columns)
 
 
 #------------------------ get daily participants event wise --------
 
 @router.get("/analysis/daily_participant_event/{event_id}", response_description="Get Participant")
-async def get_daily_participant_for_event_info(response: Response,event_id:int, db: Session = Depends(get_db)):
-    sales_data_participant=await get_daily_participants_for_event(db,event_id)
-    return ResponseModel(sales_data_participant,"Daily participant data retrieved successfully")
+async def get_daily_participant_for_event_info(response: Response,event_id:int, db: AsyncSession = Depends(get_db),
+                                               start: Optional[date] = None, end: Optional[date] = None,
+                                               granularity: str = "day", columns: bool = False):
+    return await daily_report(response, get_daily_participants_for_event, "Daily participant data retrieved successfully",
+                              db, event_id, start=start, end=end, granularity=granularity, columns=columns)
 
 
 
 #------------------------ get total sale category wise --------
 
 @router.get("/analysis/total_sale_category/{category}", response_description="Get Participant")
-async def get_total_sale_for_category(response: Response,category:str, db: Session = Depends(get_db)):
+async def get_total_sale_for_category(response: Response,category:str, db: AsyncSession = Depends(get_db)):
     sales_data_category=await get_total_sale_category_wise(db,category)
     return ResponseModel(sales_data_category,"Total sale category wise retrieved successfully")
 
@@ -113,7 +174,7 @@ async def get_total_sale_for_category(response: Response,category:str, db: Sessi
 #------------------------ get total sale Event-wise --------
 
 @router.get("/analysis/total_sale_event/{event_id}", response_description="Get Participant")
-async def get_total_sale_for_event(response: Response,event_id:int, db: Session = Depends(get_db)):
+async def get_total_sale_for_event(response: Response,event_id:int, db: AsyncSession = Depends(get_db)):
     sales_data_event=await get_total_sale_event_wise(db,event_id)
     return ResponseModel(sales_data_event,"Total sale event wise retrieved successfully")
 
@@ -122,7 +183,7 @@ async def get_total_sale_for_event(response: Response,event_id:int, db: Session
 #------------------------ get total monthly sale --------
 
 @router.get("/analysis/total_monthly_sale", response_description="Get Participant")
-async def get_monthly_total_sale_info(response: Response, db: Session = Depends(get_db)):
+async def get_monthly_total_sale_info(response: Response, db: AsyncSession = Depends(get_db)):
     sales_data_monthly_total=await get_monthly_total_sale(db)
     return ResponseModel(sales_data_monthly_total,"Monthly total sale retrieved successfully")
 
@@ -131,7 +192,7 @@ async def get_monthly_total_sale_info(response: Response, db: Session = Depends(
 #------------------------ get total monthly sale category wise --------
 
 @router.get("/analysis/total_monthly_sale_category/{category}", response_description="Get Participant")
-async def get_monthly_sale_for_category_info(response: Response,category:str, db: Session = Depends(get_db)):
+async def get_monthly_sale_for_category_info(response: Response,category:str, db: AsyncSession = Depends(get_db)):
     sales_data_monthly_category=await get_monthly_category_sale(db,category)
     return ResponseModel(sales_data_monthly_category,"Monthly total sale for category retrieved successfully")
 
@@ -140,9 +201,13 @@ async def get_monthly_sale_for_category_info(response: Response,category:str, db
 #------------------------ get total monthly sale event wise --------
 
 @router.get("/analysis/total_monthly_sale_event/{event_id}", response_description="Get Participant")
-async def get_monthly_sale_for_event_info(response: Response,event_id:int, db: Session = Depends(get_db)):
+async def get_monthly_sale_for_event_info(response: Response,event_id:int, db: AsyncSession = Depends(get_db)):
     sales_data_monthly_event=await get_monthly_event_sale(db,event_id)
     return ResponseModel(sales_data_monthly_event,"Monthly total sale for event retrieved successfully")
 
 
-
+# ----------------------- WEBSOCKET -----------------------
+@router.websocket("/ws/participants")
+async def websocket_participants(websocket: WebSocket):
+    # Clients may send {"action": "subscribe", "topic": "event:<id>"} to filter updates
+    await participant_manager.serve(websocket)
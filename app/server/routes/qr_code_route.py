@@ -4,23 +4,58 @@ from fastapi import (
 )
 import re, os, shutil
 from fastapi.encoders import jsonable_encoder
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from server.database import get_db
 from server.controller.qrcode_event_controller import *
-from server.schema.qr_code_schema import QRCodeUpdate
+from server.controller.qr_renderer import qr_renderer, MEDIA_TYPES
+from server.schema.qr_code_schema import QRCodeUpdate, OfflineScanBatch
+from typing import Optional
 from server.controller.ws_manager import qr_code_manager
 from server.response_model import ResponseModel, ErrorResponseModel
-from datetime import datetime
+from datetime import datetime, timezone
 
 router = APIRouter()
 
 @router.get("/verify/{qr_text}", response_description="Verification completed successfully")
-async def verification_of_qr_code(qr_text:str,db: Session = Depends(get_db)):
+async def verification_of_qr_code(qr_text:str,db: AsyncSession = Depends(get_db)):
     verification=await verify_qr_code(db,qr_text)
     if (verification["status"]=="valid"):
         return ResponseModel(verification,"Verified")
     return ErrorResponseModel("Failed to verified",400,verification["message"])
 
+@router.get("/ticket/{token}", response_description="Ticket QR image")
+async def ticket_qr_image(token:str, format:str = "png"):
+    # The signed token is the ticket; forged ones are rejected without touching the database
+    if not read_ticket_token(token):
+        return ErrorResponseModel("Invalid ticket", 404, "Ticket token is not valid")
+    if format not in MEDIA_TYPES:
+        return ErrorResponseModel("Invalid format", 400, "Format must be png or svg")
+    image = await qr_renderer.render(token, format)
+    return Response(
+        content=image,
+        media_type=MEDIA_TYPES[format],
+        headers={"Cache-Control": "private, max-age=86400, immutable"}
+    )
+
+# ----------------------- Offline scanners: manifest -----------------------
+@router.get("/manifest/{event_id}", response_description="Ticket manifest for offline gate devices")
+async def ticket_manifest(event_id:int, since: Optional[datetime] = None, db: AsyncSession = Depends(get_db)):
+    if since and since.tzinfo:
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    manifest = await get_ticket_manifest(db, event_id, since)
+    if not manifest:
+        return ErrorResponseModel("Event not found", 404, "Event not found")
+    return ResponseModel(manifest, "Manifest retrieved")
+
+# ----------------------- Offline scanners: upload scans -----------------------
+@router.post("/checkin/batch", response_description="Apply a batch of offline scans")
+async def upload_offline_scans(batch: OfflineScanBatch, db: AsyncSession = Depends(get_db)):
+    try:
+        result = await apply_offline_scans(db, batch.event_id, batch.scans)
+    except Exception as e:
+        return ErrorResponseModel("Failed to apply scans", 400, str(e))
+    return ResponseModel(result, "Scans applied")
+
 
 __all__ = ["router"]
 
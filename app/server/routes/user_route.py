@@ -1,10 +1,10 @@
 from fastapi import (
     APIRouter, Request, Response, status,
-    Form, File, UploadFile, Depends, Body
+    Form, File, UploadFile, Depends, Body, WebSocket
 )
 import re, os, shutil
 from fastapi.encoders import jsonable_encoder
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from server.database import get_db
 from server.controller.user_controller import *
 from server.schema.user_schema import UserUpdate
@@ -28,7 +28,7 @@ async def add_user_data(
     password: str = Form(...),
     file: UploadFile = File(None),
     phone_number: str = Form(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     try:
         if re.match(r"[^@]+@[^@]+\.[^@]+", name):
@@ -70,14 +70,14 @@ async def add_user_data(
 
 # ----------------------- GET ALL USERS -----------------------
 @router.get("/all", response_description="Retrieve all users")
-async def get_users(response: Response, db: Session = Depends(get_db)):
+async def get_users(response: Response, db: AsyncSession = Depends(get_db)):
     users = await retrieve_users(db)
     return ResponseModel(users, "Users retrieved successfully")
 
 
 # ----------------------- SEARCH USER -----------------------
 @router.get("/search/{user_id}")
-async def search_user(response: Response, user_id: str, db: Session = Depends(get_db)):
+async def search_user(response: Response, user_id: str, db: AsyncSession = Depends(get_db)):
     try:
         user = await retrieve_searched_users(db, "name", user_id)
         if user:
@@ -102,7 +102,7 @@ async def update_user_data(
     response: Response,
     email: str,
     update_data: UserUpdate = Body(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     try:
         existing_user = await retrieve_user_by_email(db, email)
@@ -122,7 +122,7 @@ async def update_user_data(
 
 # ----------------------- DELETE USER -----------------------
 @router.delete("/delete/{email}")
-async def delete_user_data(response: Response, email: str, db: Session = Depends(get_db)):
+async def delete_user_data(response: Response, email: str, db: AsyncSession = Depends(get_db)):
     deleted_user = await delete_user(db, email)
     if deleted_user:
         return ResponseModel(f"User with email: {email} removed", "User deleted successfully")
@@ -131,7 +131,7 @@ async def delete_user_data(response: Response, email: str, db: Session = Depends
 
 # ----------------------- USER LOGIN -----------------------
 @router.get("/login/email/{email}/password/{password}", response_description="User login")
-async def get_user_login_msg(response: Response, email: str, password: str, db: Session = Depends(get_db)):
+async def get_user_login_msg(response: Response, email: str, password: str, db: AsyncSession = Depends(get_db)):
     result = await user_login(db, email, password)
     if result["status"] == "failed":
         response.status_code = status.HTTP_400_BAD_REQUEST
@@ -145,7 +145,7 @@ async def update_password(
     user_id: int,
     current_password: str = Form(...),
     new_password: str = Form(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     try:
         user = await retrieve_user(db, "id", user_id)
@@ -165,7 +165,7 @@ async def update_password(
 
 # ----------------------- FORGOT PASSWORD (SEND OTP) -----------------------
 @router.post("/password/forgot", response_description="Send OTP for password reset")
-async def forgot_password(response: Response, email: str = Form(...), db: Session = Depends(get_db)):
+async def forgot_password(response: Response, email: str = Form(...), db: AsyncSession = Depends(get_db)):
     try:
         if not re.match(r"^[\w\.-]+@[\w\.-]+\.\w+$", email):
             return ErrorResponseModel(f"Invalid email: {email}", 400, "Email format invalid")
@@ -181,7 +181,7 @@ async def forgot_password(response: Response, email: str = Form(...), db: Sessio
 
 # ----------------------- VERIFY OTP -----------------------
 @router.post("/password/verify", response_description="Verify OTP for password reset")
-async def verify_reset_otp(response: Response, email: str = Form(...), otp: str = Form(...), db: Session = Depends(get_db)):
+async def verify_reset_otp(response: Response, email: str = Form(...), otp: str = Form(...), db: AsyncSession = Depends(get_db)):
     result = await verify_reset_otp_controller(db, email, otp,"user")
     response.status_code = result.get("code", status.HTTP_200_OK)
     return result
@@ -193,7 +193,7 @@ async def handle_password_reset(
     response: Response,
     email: str = Form(...),
     new_password: str = Form(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     result = await password_reset_controller(db, email, new_password)
     response.status_code = result["code"] if "code" in result else status.HTTP_200_OK
@@ -201,13 +201,9 @@ async def handle_password_reset(
 
 # ----------------------- WEBSOCKET -----------------------
 @router.websocket("/ws/users")
-async def websocket_users(websocket):
-    await user_manager.connect(websocket)
-    try:
-        while True:
-            await websocket.receive_text()
-    except:
-        user_manager.disconnect(websocket)
+async def websocket_users(websocket: WebSocket):
+    # Clients may send {"action": "subscribe", "topic": ...} to filter updates
+    await user_manager.serve(websocket)
 
 
 __all__ = ["router"]
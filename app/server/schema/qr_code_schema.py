@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 class QRCodeUpdate(BaseModel):
@@ -10,3 +10,14 @@ class QRCodeUpdate(BaseModel):
 
     class Config:
         extra = "ignore"
+
+
+class OfflineScan(BaseModel):
+    ticket: str
+    scanned_at: datetime
+
+
+class OfflineScanBatch(BaseModel):
+    event_id: int
+    device_id: Optional[str] = None
+    scans: List[OfflineScan]
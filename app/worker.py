@@ -0,0 +1,21 @@
+import asyncio
+from dotenv import load_dotenv
+load_dotenv()
+
+from server.database import Base, engine
+from server.controller.job_queue import run_job_worker
+from server.controller.mail_transport import mail_pool
+from server.controller import qrcode_event_controller  # registers ticket job handlers
+from server.models.user_model import User
+from server.models.host_model import Host
+from server.models.event_model import Event
+from server.models.participant_model import Participant
+from server.models.qrcode_model import QRCode
+from server.models.job_model import Job
+
+if __name__=="__main__":
+    Base.metadata.create_all(bind=engine)
+    try:
+        asyncio.run(run_job_worker())
+    finally:
+        mail_pool.close()
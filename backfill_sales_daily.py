@@ -0,0 +1,66 @@
+"""
+Migration script to create the sales_daily rollup table and fill it from
+the participants table.
+
+Bookings keep sales_daily up to date as they are made; this builds it for
+an existing database and can be re-run at any time to rebuild it from
+scratch. The rebuild holds an EXCLUSIVE lock on sales_daily: bookings
+still in flight when it starts are counted, and bookings made while it
+runs wait for it and are then added on top, so none is lost or counted
+twice.
+"""
+import sys
+import os
+
+# Add the app directory to the path
+app_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app')
+sys.path.insert(0, app_dir)
+
+from server.database import SessionLocal, engine
+# The referenced tables have to be known to create sales_daily
+from server.models.host_model import Host
+from server.models.event_model import Event
+from server.models.sales_daily_model import SalesDaily
+from sqlalchemy import text
+
+def backfill_sales_daily():
+    """Create sales_daily if missing and rebuild it from participants"""
+    print("Creating 'sales_daily' table if missing...")
+    SalesDaily.__table__.create(bind=engine, checkfirst=True)
+
+    db = SessionLocal()
+    try:
+        print("Rebuilding daily sales from participants...")
+        db.execute(text("LOCK TABLE sales_daily IN EXCLUSIVE MODE"))
+        db.execute(text("DELETE FROM sales_daily"))
+        result = db.execute(text("""
+            INSERT INTO sales_daily (event_id, day, category, host_id, revenue, tickets)
+            SELECT p.event_id, date(p.payment_date), e.event_category, e.host_id,
+                   COALESCE(SUM(p.payment), 0), COALESCE(SUM(p.total_booked), 0)
+            FROM participants p
+            JOIN events e ON e.id = p.event_id
+            WHERE p.payment_date IS NOT NULL
+            GROUP BY p.event_id, date(p.payment_date), e.event_category, e.host_id
+        """))
+        db.commit()
+
+        row_count = result.rowcount
+        print(f"✅ Wrote {row_count} daily sales rows.")
+        db.execute(text("ANALYZE sales_daily"))
+        db.commit()
+        return row_count
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error: {str(e)}")
+        raise
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    print("Starting migration to backfill sales_daily...")
+    try:
+        count = backfill_sales_daily()
+        print(f"\n✅ Migration completed successfully! {count} rows in sales_daily.")
+    except Exception as e:
+        print(f"\n❌ Migration failed: {str(e)}")
+        sys.exit(1)
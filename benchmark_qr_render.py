@@ -0,0 +1,76 @@
+"""
+Benchmark of ticket QR rendering, in tickets per second and per core.
+
+    python benchmark_qr_render.py [tickets] [workers]
+
+Compares the original per-ticket qrcode.make() + PIL PNG path with the
+QR renderer, serially (cold and warm module-matrix cache) and through
+its process pool.
+"""
+import asyncio
+import os
+import sys
+import time
+from io import BytesIO
+
+# Add the app directory to the path
+app_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app')
+sys.path.insert(0, app_dir)
+
+import qrcode
+from server.cryptography import sign_ticket
+from server.controller.qr_renderer import QRRenderer, qr_matrix, render_batch
+from server.constant_file import qr_error_correction, qr_box_size, qr_border
+
+
+def report(name, tickets, seconds, cores=1):
+    rate = tickets / seconds
+    print(f"{name:<34} {rate:>9.0f} tickets/s {rate / cores:>9.0f} /core")
+
+
+def legacy(payloads):
+    for payload in payloads:
+        buffered = BytesIO()
+        qrcode.make(payload).save(buffered, format="PNG")
+
+
+def main():
+    tickets = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else (os.cpu_count() or 1)
+    payloads = [sign_ticket(1, ticket_id) for ticket_id in range(1, tickets + 1)]
+    options = (qr_error_correction, qr_box_size, qr_border)
+
+    start = time.perf_counter()
+    legacy(payloads)
+    report("qrcode.make + PNG (before)", tickets, time.perf_counter() - start)
+
+    for fmt in ("png", "svg"):
+        qr_matrix.cache_clear()
+        start = time.perf_counter()
+        render_batch(payloads, fmt, *options)
+        report(f"renderer {fmt}, cold matrix cache", tickets, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        render_batch(payloads, fmt, *options)
+        report(f"renderer {fmt}, warm matrix cache", tickets, time.perf_counter() - start)
+
+    qr_matrix.cache_clear()
+    start = time.perf_counter()
+    for payload in payloads:
+        qr_matrix(payload, qr_error_correction, 0)
+    report("matrix only, fixed mask pattern 0", tickets, time.perf_counter() - start)
+
+    async def pooled():
+        renderer = QRRenderer(workers=workers)
+        await renderer.render_many(payloads[:2 * workers])  # start the processes
+        start = time.perf_counter()
+        await renderer.render_many(payloads)
+        elapsed = time.perf_counter() - start
+        renderer.shutdown()
+        return elapsed
+
+    report(f"renderer png, pool of {workers}", tickets, asyncio.run(pooled()), workers)
+
+
+if __name__ == "__main__":
+    main()
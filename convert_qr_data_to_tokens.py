@@ -0,0 +1,71 @@
+"""
+Migration script to replace the base64 PNGs stored in qrcodes.qr_data
+with compact signed ticket tokens.
+
+Tickets that were already sent out keep working: their printed QR still
+carries the old uid/eid/uemail payload, which verification matches
+without looking at qr_data.
+"""
+import sys
+import os
+
+# Add the app directory to the path
+app_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app')
+sys.path.insert(0, app_dir)
+
+from server.database import SessionLocal, engine
+from server.cryptography import sign_ticket
+from sqlalchemy import text
+
+BATCH_SIZE = 1000
+
+def convert_qr_data_to_tokens():
+    """Rewrite qr_data of every legacy ticket, in batches"""
+    db = SessionLocal()
+    try:
+        converted = 0
+        while True:
+            # Tokens look like "<event_id>.<ticket_id>.<signature>"; base64 PNGs never contain a dot
+            rows = db.execute(text("""
+                SELECT id, event_id
+                FROM qrcodes
+                WHERE position('.' in qr_data) = 0
+                ORDER BY id
+                LIMIT :limit
+            """), {"limit": BATCH_SIZE}).all()
+            if not rows:
+                break
+
+            db.execute(
+                text("UPDATE qrcodes SET qr_data = :token WHERE id = :id"),
+                [{"id": row.id, "token": sign_ticket(row.event_id, row.id)} for row in rows]
+            )
+            db.commit()
+            converted += len(rows)
+            print(f"Converted {converted} tickets...")
+
+        return converted
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error: {str(e)}")
+        raise
+    finally:
+        db.close()
+
+def reclaim_space():
+    """Rewrite the table so the freed PNG storage goes back to the OS"""
+    print("Running VACUUM FULL on qrcodes (takes an exclusive lock)...")
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("VACUUM FULL ANALYZE qrcodes"))
+    print("✅ Space reclaimed.")
+
+if __name__ == "__main__":
+    print("Starting migration of qrcodes.qr_data to signed tokens...")
+    try:
+        count = convert_qr_data_to_tokens()
+        print(f"\n✅ Migration completed successfully! {count} tickets converted.")
+        if count and "--vacuum" in sys.argv:
+            reclaim_space()
+    except Exception as e:
+        print(f"\n❌ Migration failed: {str(e)}")
+        sys.exit(1)
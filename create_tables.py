@@ -17,6 +17,10 @@ from server.models.event_model import Event
 from server.models.participant_model import Participant
 from server.models.qrcode_model import QRCode
 from server.models.otp_records_model import OTPRecord
+from server.models.seat_hold_model import SeatHold
+from server.models.job_model import Job
+from server.models.outbox_model import OutboxEvent
+from server.models.sales_daily_model import SalesDaily
 
 def create_tables():
     """Create all database tables"""